@@ -4,6 +4,10 @@ import re
 import sys
 import os
 import json
+import asyncio
+import argparse
+import threading
+import contextvars
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -13,39 +17,107 @@ load_dotenv()
 # Set current working directory to script location to ensure consistent paths
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
+# Make the shared modules in scripts/ importable
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+from run_trace import span, export_chrome_trace, trace_lane, TRACE_EVENTS_ENV, TRACE_LANE_ENV
+from results_journal import reset_journal, compact_results, read_journal
+from run_history import record_run, HISTORY_DB
+from command_runner import sweep_orphans, prune_output_dirs, OUTPUT_DIR_ENV
+from helper_functions import SnippetContext
+from snippet_engine import load_manifest, discover, run_snippet, shared_runs
+from docs_discovery import save_discovered
+from incremental import INCREMENTAL_ENV, ROTATION_NIGHTS
+from dependency_mirror import mirror_env, MIRROR_DIR
+from lockfiles import archive_run_lockfiles, LOCKFILE_DIR
+from toolchain_caches import cache_env, inventory, record_stats, evict_caches, CACHE_ROOT, CACHE_BUDGET_BYTES
+
+# Parse command line options
+parser = argparse.ArgumentParser(description="Run the Avail SDK nightly checks")
+parser.add_argument("--serial", action="store_true", help="Run the SDK lanes one after another instead of concurrently")
+parser.add_argument("--offline", action="store_true", help="Read docs pages only from the local docs cache")
+parser.add_argument("--fresh-env", action="store_true", help="Rebuild the SDK environments from scratch instead of restoring snapshots")
+parser.add_argument("--snippet-processes", action="store_true", help="Check each snippet in its own Python process (scripts/snippet_engine.py) instead of in this interpreter")
+parser.add_argument("--no-lane-builds", action="store_true", help="Compile and run each snippet on its own instead of building all snippets of a lane at once")
+parser.add_argument("--incremental", action="store_true", help="Only rerun snippets that changed or failed last time, plus a rotating sample, and carry over the other results")
+parser.add_argument("--mirror", action="store_true", help="Fetch npm packages, crates and Go modules from the local dependency mirror first, filling it on the way")
+parser.add_argument("--no-discover", action="store_true", help="Do not scan the docs pages for snippets scripts/snippets.toml does not list")
+args = parser.parse_args()
+
 # Path to results file
 RESULTS_FILE = "/root/desktop/run-results.json"
+# Identifies this run in the docs cache and the run history
+RUN_STARTED_AT = datetime.now()
+RUN_ID = RUN_STARTED_AT.strftime("%Y%m%dT%H%M%S")
 LOG_FILE = "/root/desktop/last-run-log.txt"
+# Chrome trace of the run (open in chrome://tracing or ui.perfetto.dev) and the raw spans it is built from
+TRACE_FILE = "/root/desktop/last-run-trace.json"
+TRACE_EVENTS_FILE = "/root/desktop/last-run-trace.jsonl"
+# Complete output of every snippet run and build, one directory per run (not pushed)
+RUN_OUTPUT_ROOT = "/root/desktop/run-output"
+RUN_OUTPUTS_TO_KEEP = 7
+# Snippets discovered on the docs pages this run, read by engine processes (--snippet-processes)
+DISCOVERED_FILE = os.path.join(RUN_OUTPUT_ROOT, RUN_ID, "discovered-snippets.json")
+# Output lines of child scripts waiting for the log writer; readers wait while it is full
+LOG_QUEUE_SIZE = 1000
+# Longest output line read from a child script
+STREAM_LINE_LIMIT = 1024 * 1024
+# Snippets of a lane preparing their sources at the same time
+PREPARE_CONCURRENCY = 8
+
+# Prefix for every line printed by a snippet running in-process, e.g. "[avail-rust] [system_account] "
+output_prefix = contextvars.ContextVar("output_prefix", default="")
 
 # Create a custom output capturer
 class OutputCapturer:
-    def __init__(self):
+    def __init__(self, log_path):
         self.terminal = sys.stdout
-        self.log_content = []
+        # Written through line by line, so the log of the whole night is never held in memory
+        self.log_file = open(log_path, 'w', buffering=1)
+        # Snippets running in-process print from worker threads
+        self.lock = threading.Lock()
+        # Unfinished line of each prefix, print() writes the text and the newline separately
+        self.pending = {}
     
     def write(self, message):
-        self.terminal.write(message)
-        self.log_content.append(message)
+        prefix = output_prefix.get()
+        with self.lock:
+            if prefix:
+                *lines, rest = (self.pending.pop(prefix, "") + message).split("\n")
+                if rest:
+                    self.pending[prefix] = rest
+                message = "".join(f"{prefix}{line}\n" for line in lines)
+            self.terminal.write(message)
+            self.log_file.write(message)
     
     def flush(self):
         self.terminal.flush()
+        self.log_file.flush()
     
-    def get_content(self):
-        return ''.join(self.log_content)
+    def close(self):
+        self.log_file.close()
 
-# Clear log file at beginning
-with open(LOG_FILE, 'w') as f:
-    f.write("")  # Empty the file
-print(f"Cleared log file: {LOG_FILE}")
+with open(TRACE_EVENTS_FILE, 'w') as f:
+    f.write("")
+# This process and every child script append their timing spans here, see scripts/run_trace.py
+os.environ[TRACE_EVENTS_ENV] = TRACE_EVENTS_FILE
 
-# Set up output capture
-output_capturer = OutputCapturer()
+# Set up output capture, truncating the log of the previous run
+output_capturer = OutputCapturer(LOG_FILE)
 sys.stdout = output_capturer
+print(f"Writing log to {LOG_FILE}")
+
+# Commands keep only the tail of their output in memory and write all of it here, see scripts/command_runner.py
+prune_output_dirs(RUN_OUTPUT_ROOT, RUN_OUTPUTS_TO_KEEP - 1)
+os.environ[OUTPUT_DIR_ENV] = os.path.join(RUN_OUTPUT_ROOT, RUN_ID)
+print(f"Full command output of this run goes to {os.environ[OUTPUT_DIR_ENV]}")
 
 # Reset all results to false at the beginning of each run
 def reset_results():
     print("\n=== Resetting all test results to false ===")
     
+    # Results of this run are appended to the journal and compacted at the end
+    reset_journal()
+    
     # Create default structure if file doesn't exist
     if not os.path.exists(RESULTS_FILE):
         default_results = {
@@ -105,7 +177,7 @@ def push_to_github():
         # Stage changes
         print("\nStaging changes...")
         stage_result = subprocess.run(
-            ["git", "add", "run-results.json", "last-run-log.txt"],
+            ["git", "add", "run-results.json", "last-run-log.txt", "last-run-trace.json"],
             cwd="/root/desktop",
             capture_output=True,
             text=True
@@ -160,228 +232,272 @@ def push_to_github():
         print(f"Error during Git operations: {e}")
         return False
 
-try:
-    # Force scripts to flush output immediately and add all required paths
-    env = os.environ.copy()
-    env["PATH"] = "/root/.nvm/versions/node/v22.14.0/bin:/root/.local/share/pnpm:/root/.cargo/bin:/usr/local/go/bin:/usr/bin:/bin:/usr/local/bin:" + env.get("PATH", "")
-    env["PYTHONUNBUFFERED"] = "1"
+# Every snippet checked tonight, from scripts/snippets.toml (discovered snippets are added once the run starts)
+snippets = load_manifest()
 
-    # Execute the Avail-js environment setup script
-    print("\n=== Setting up avail-js environment ===")
-    avail_js_env_setup_script = "./scripts/dev-env/avail-js.py"
-    print(f"Running script: {os.path.abspath(avail_js_env_setup_script)}")
+# One lane per SDK: each lane sets up its own environment and then checks every
+# snippet for that SDK only. Lanes work in separate directories, so they
+# can run concurrently. Lanes with a lane build write all snippet sources first,
+# compile them in a single build and then run the prebuilt binaries.
+SDK_LANES = [
+    {
+        "sdk": "js",
+        "name": "avail-js",
+        "setup_script": "./scripts/dev-env/avail-js.py",
+        "lane_build": True
+    },
+    {
+        "sdk": "rust",
+        "name": "avail-rust",
+        "setup_script": "./scripts/dev-env/avail-rust.py",
+        "lane_build": True
+    },
+    {
+        "sdk": "go",
+        "name": "avail-go",
+        "setup_script": "./scripts/dev-env/avail-go.py",
+        "lane_build": True
+    }
+]
 
-    try:
-        # Use Popen for real-time output streaming
-        process = subprocess.Popen(
-            ["python", avail_js_env_setup_script],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,  # Line buffered
-            env=env  # Use the same env with PYTHONUNBUFFERED=1
-        )
-        
-        # Stream output in real-time
-        for line in iter(process.stdout.readline, ''):
-            print(line, end='')  # Print each line as it comes
-        
-        # Wait for the process to complete and get return code
-        return_code = process.wait()
-        
-        if return_code != 0:
-            print(f"\nAvail-js environment setup failed with return code {return_code}")
-            sys.exit(1)
-        else:
-            print("\nAvail-js environment setup completed successfully")
-            
-    except Exception as e:
-        print(f"Error running avail-js environment setup script: {e}")
-        sys.exit(1)
-    print("\n================================================")
+class LogWriter:
+    """
+    Single writer for the output of all child scripts. Readers hand it
+    prefixed lines through a bounded queue, so a child flooding its output
+    is slowed down (its pipe fills up) instead of piling up in memory.
+    """
+    
+    def __init__(self, max_lines=LOG_QUEUE_SIZE):
+        self.queue = asyncio.Queue(maxsize=max_lines)
+        self.task = None
+    
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+    
+    async def run(self):
+        while True:
+            line = await self.queue.get()
+            print(line, end='')
+            self.queue.task_done()
+    
+    async def write(self, line):
+        # Waits while the queue is full
+        await self.queue.put(line)
+    
+    async def close(self):
+        await self.queue.join()
+        self.task.cancel()
 
+# Created by run_lanes on the event loop
+log_writer = None
 
-    # Execute the Avail-rust environment setup script
-    print("\n=== Setting up avail-rust environment ===")
-    avail_rust_env_setup_script = "./scripts/dev-env/avail-rust.py"
-    print(f"Running script: {os.path.abspath(avail_rust_env_setup_script)}")
+async def lane_print(lane_name, message=""):
+    """Print a message with the lane name as prefix on every line"""
+    for line in message.split("\n"):
+        await log_writer.write(f"[{lane_name}] {line}\n")
 
+async def run_script(script_args, lane_name, label=None):
+    """Run a python script, streaming its output with the lane (and snippet) name as prefix"""
+    prefix = f"[{lane_name}] " + (f"[{label}] " if label else "")
+    # Output of all children is read on the event loop, no thread per pipe
+    process = await asyncio.create_subprocess_exec(
+        "python", *script_args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        limit=STREAM_LINE_LIMIT,
+        env={**env, TRACE_LANE_ENV: lane_name}  # Use the same env with PYTHONUNBUFFERED=1
+    )
+    
+    # Stream output in real-time
+    while True:
+        try:
+            line = await process.stdout.readline()
+        except ValueError:
+            # The reader drops a line longer than the limit
+            await log_writer.write(f"{prefix}[output line longer than {STREAM_LINE_LIMIT} bytes skipped]\n")
+            continue
+        if not line:
+            break
+        await log_writer.write(prefix + line.decode("utf-8", "replace"))
+    
+    # Wait for the process to complete and get return code
+    return await process.wait()
+
+def run_snippet_in_thread(snippet, context, lane_name):
+    """Check a snippet in the current worker thread, returns an exit code like run_script"""
+    # Only set in the copied context of this call
+    output_prefix.set(f"[{lane_name}] [{snippet['id']}] ")
+    trace_lane.set(lane_name)
+    return 0 if run_snippet(snippet, context) else 1
+
+async def run_lane_snippet(lane, snippet, stage=None, shared=None):
+    """Check one snippet for the SDK of a lane, shared maps its duplicates to the snippet they reuse"""
+    lane_name = lane["name"]
+    snippet_name = snippet["name"]
+    
+    await lane_print(lane_name, f"\n=== Running {snippet_name}{f' ({stage} stage)' if stage else ''} ===")
+    
     try:
-        # Use Popen for real-time output streaming
-        process = subprocess.Popen(
-            ["python", avail_rust_env_setup_script],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,  # Line buffered
-            env=env  # Use the same env with PYTHONUNBUFFERED=1
-        )
-        
-        # Stream output in real-time
-        for line in iter(process.stdout.readline, ''):
-            print(line, end='')  # Print each line as it comes
-        
-        # Wait for the process to complete and get return code
-        return_code = process.wait()
+        with span(snippet_name, "snippet", lane=lane_name, sdk=lane["sdk"], stage=stage) as snippet_span:
+            if args.snippet_processes:
+                stage_args = ["--stage", stage] if stage else []
+                discover_args = ["--discovered", DISCOVERED_FILE] if snippet.get("discovered") else []
+                return_code = await run_script(
+                    ["./scripts/snippet_engine.py", "--snippet", snippet["id"], "--sdk", lane["sdk"], *stage_args, *discover_args],
+                    lane_name,
+                    snippet["id"]
+                )
+            else:
+                # Blocking (it waits for the snippet commands), so it runs in a worker thread
+                context = SnippetContext([lane["sdk"]], stage, shared)
+                return_code = await asyncio.to_thread(run_snippet_in_thread, snippet, context, lane_name)
+            snippet_span["returncode"] = return_code
+        await lane_print(lane_name, f"\n{snippet_name} completed with return code: {return_code}")
         
+        # Optionally handle non-zero return codes
         if return_code != 0:
-            print(f"\nAvail-rust environment setup failed with return code {return_code}")
-            sys.exit(1)
-        else:
-            print("\nAvail-rust environment setup completed successfully")
+            await lane_print(lane_name, f"WARNING: {snippet_name} returned non-zero exit code: {return_code}")
             
-    except subprocess.TimeoutExpired:
-        print(f"Avail-rust environment setup script timed out.")
-        sys.exit(1)
     except Exception as e:
-        print(f"Error running avail-rust environment setup script: {e}")
-        sys.exit(1)
-    print("\n================================================")
+        await lane_print(lane_name, f"Error running {snippet_name}: {e}")
+    
+    await lane_print(lane_name, "\n================================================")
 
-    # Execute the Avail-go environment setup script
-    print("\n=== Setting up avail-go environment ===")
-    avail_go_env_setup_script = "./scripts/dev-env/avail-go.py"
-    print(f"Running script: {os.path.abspath(avail_go_env_setup_script)}")
+async def run_lane_snippets(lane, shared, stage=None):
+    """Check every snippet for the SDK of a lane, optionally for a single lane build stage"""
+    lane_snippets = [snippet for snippet in snippets if lane["sdk"] in snippet]
+    if stage != "prepare":
+        # Snippets of a lane share its environment (and its account), so they run one after another
+        for snippet in lane_snippets:
+            await run_lane_snippet(lane, snippet, stage, shared)
+        return
+    
+    # Preparing only fetches docs and writes each snippet's own source file, so snippets can overlap
+    semaphore = asyncio.Semaphore(PREPARE_CONCURRENCY)
+    
+    async def prepare(snippet):
+        async with semaphore:
+            await run_lane_snippet(lane, snippet, stage, shared)
+    
+    await asyncio.gather(*(prepare(snippet) for snippet in lane_snippets))
+
+async def run_lane(lane):
+    """
+    Set up the environment for one SDK and check all snippets for it.
+    A setup failure only skips the snippets of this lane.
+    Returns True if the environment setup succeeded.
+    """
+    with span(lane["name"], "lane", lane=lane["name"], sdk=lane["sdk"]):
+        return await run_lane_steps(lane)
 
+async def run_lane_steps(lane):
+    lane_name = lane["name"]
+    
+    # Execute the environment setup script
+    await lane_print(lane_name, f"\n=== Setting up {lane_name} environment ===")
+    await lane_print(lane_name, f"Running script: {os.path.abspath(lane['setup_script'])}")
     try:
-        # Use Popen for real-time output streaming
-        process = subprocess.Popen(
-            ["python", avail_go_env_setup_script],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,  # Line buffered
-            env=env  # Use the same env with PYTHONUNBUFFERED=1
-        )
-        
-        # Stream output in real-time
-        for line in iter(process.stdout.readline, ''):
-            print(line, end='')  # Print each line as it comes
-        
-        # Wait for the process to complete and get return code
-        return_code = process.wait()
-        
-        if return_code != 0:
-            print(f"\nAvail-go environment setup failed with return code {return_code}")
-            sys.exit(1)
-        else:
-            print("\nAvail-go environment setup completed successfully")
-            
-    except subprocess.TimeoutExpired:
-        print(f"Avail-go environment setup script timed out.")
-        sys.exit(1)
+        with span("environment setup", "setup", lane=lane_name, sdk=lane["sdk"]):
+            return_code = await run_script([lane["setup_script"]], lane_name, "setup")
     except Exception as e:
-        print(f"Error running avail-go environment setup script: {e}")
-        sys.exit(1)
-    print("\n================================================")
+        await lane_print(lane_name, f"Error running {lane_name} environment setup script: {e}")
+        return False
+    
+    if return_code != 0:
+        await lane_print(lane_name, f"\n{lane_name} environment setup failed with return code {return_code}, skipping its snippets")
+        return False
+    await lane_print(lane_name, f"\n{lane_name} environment setup completed successfully")
+    await lane_print(lane_name, "\n================================================")
+    
+    # Snippets running the same code and run command as an earlier one (mostly docs-section twins
+    # of API reference pages) are not run again, they report the earlier snippet's result
+    lane_snippets = [snippet for snippet in snippets if lane["sdk"] in snippet]
+    shared = await asyncio.to_thread(shared_runs, lane_snippets, [lane["sdk"]])
+    for (_, snippet_id), shared_with in shared.items():
+        await lane_print(lane_name, f"{snippet_id} is identical to {shared_with}, it reports that result")
+    
+    if lane.get("lane_build") and not args.no_lane_builds:
+        # Write every snippet source, compile them all at once, then run the binaries
+        await run_lane_snippets(lane, shared, "prepare")
+        await lane_print(lane_name, f"\n=== Building all {lane_name} snippets ===")
+        with span("lane build", "compile", lane=lane_name, sdk=lane["sdk"]):
+            return_code = await run_script(["./scripts/lane_builds.py", "--sdk", lane["sdk"]], lane_name, "lane build")
+        if return_code != 0:
+            await lane_print(lane_name, f"WARNING: {lane_name} lane build returned non-zero exit code: {return_code}")
+        await lane_print(lane_name, "\n================================================")
+        await run_lane_snippets(lane, shared, "run")
+    else:
+        await run_lane_snippets(lane, shared)
+    
+    return True
 
-    # Define a list of script paths and their descriptions
-    snippet_scripts = [
-        {
-            "name": "Data Submission",
-            "path": "scripts/snippets/da_submit_data.py"
-        },
-        {
-            "name": "Data Submission from Docs Section",
-            "path": "scripts/snippets/da_submit_data_from_docs_section.py"
-        },
-        {
-            "name": "Create Application Key",
-            "path": "scripts/snippets/da_create_application_key.py"
-        },
-        {
-            "name": "Balances Transfer Keep Alive",
-            "path": "scripts/snippets/balances_transfer_keep_alive.py"
-        },
-        {
-            "name": "Balances Transfer Keep Alive from Docs Section",
-            "path": "scripts/snippets/balances_transfer_keep_alive_from_docs_section.py"
-        },
-        {
-            "name": "Balances Transfer Allow Death",
-            "path": "scripts/snippets/balances_transfer_allow_death.py"
-        },
-        {
-            "name": "Balances Transfer Allow Death from Docs Section",
-            "path": "scripts/snippets/balances_transfer_allow_death_from_docs_section.py"
-        },
-        {
-            "name": "System Account Fetch",
-            "path": "scripts/snippets/system_account.py"
-        },
-        {
-            "name": "System Account Fetch from Docs Section",
-            "path": "scripts/snippets/system_account_from_docs_section.py"
-        },
-        {
-            "name": "DA Next App ID",
-            "path": "scripts/snippets/da_next_app_id.py"
-        },
-        {
-            "name": "DA App Keys",
-            "path": "scripts/snippets/da_app_keys.py"
-        },
-        {
-            "name": "DA Submission using txHash and blockHash",
-            "path": "scripts/snippets/da_submission_using_txHash_blockHash.py"
-        },
-        {
-            "name": "DA Submission using App ID",
-            "path": "scripts/snippets/da_submission_using_appID.py"
-        },
-        {
-            "name": "All DA Submissions for a given block",
-            "path": "scripts/snippets/da_all_da_submissions.py"
-        },
-        {
-            "name": "All Transactions by Signer",
-            "path": "scripts/snippets/da_all_transactions_by_signer.py"
-        },
-        {
-            "name": "Fetch All Transactions",
-            "path": "scripts/snippets/fetch_all_transactions.py"
-        }
-    ]
+async def run_lanes():
+    """Run every SDK lane concurrently on one event loop (or one after another with --serial)"""
+    global log_writer
+    log_writer = LogWriter()
+    log_writer.start()
+    try:
+        if args.serial:
+            return [await run_lane(lane) for lane in SDK_LANES]
+        return await asyncio.gather(*(run_lane(lane) for lane in SDK_LANES))
+    finally:
+        await log_writer.close()
 
-    # Execute all snippet scripts in a loop
-    for script in snippet_scripts:
-        script_name = script["name"]
-        script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), script["path"])
-        
-        print(f"\n=== Running {script_name} script ===")
-        print(f"Script path: {script_path}")
-        
-        try:
-            # Use Popen for real-time output streaming
-            process = subprocess.Popen(
-                ["python", script_path],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,  # Line buffered
-                env=env  # Use the same env with PYTHONUNBUFFERED=1
-            )
-            
-            # Stream output in real-time
-            for line in iter(process.stdout.readline, ''):
-                print(line, end='')  # Print each line as it comes
-            
-            # Wait for the process to complete and get return code
-            return_code = process.wait()
-            print(f"\n{script_name} script completed with return code: {return_code}")
-            
-            # Optionally handle non-zero return codes
-            if return_code != 0:
-                print(f"WARNING: {script_name} script returned non-zero exit code: {return_code}")
-                # Uncomment if you want to exit on any script failure
-                # sys.exit(return_code)
-                
-        except Exception as e:
-            print(f"Error running {script_name} script: {e}")
-        
-        print("\n================================================")
+# Toolchain cache entries when the run started, to tell hits from misses at the end
+caches_before = None
+
+try:
+    # Force scripts to flush output immediately and add all required paths
+    env = os.environ.copy()
+    env["PATH"] = "/root/.nvm/versions/node/v22.14.0/bin:/root/.local/share/pnpm:/root/.cargo/bin:/usr/local/go/bin:/usr/bin:/bin:/usr/local/bin:" + env.get("PATH", "")
+    env["PYTHONUNBUFFERED"] = "1"
+    # Lets child scripts recognise docs pages already revalidated during this run
+    env["NIGHTLY_RUN_ID"] = RUN_ID
+    if args.offline:
+        print("\n=== Offline mode: docs pages are read from the local cache only ===")
+        env["NIGHTLY_OFFLINE"] = "1"
+    if args.fresh_env:
+        env["NIGHTLY_FRESH_ENV"] = "1"
+    # pnpm store, Go module and build caches and CARGO_HOME live in one managed directory across runs
+    env.update(cache_env())
+    caches_before = inventory()
+    print(f"\n=== Toolchain caches in {CACHE_ROOT} ===")
+    if args.mirror:
+        print(f"\n=== Dependency mirror mode: packages come from {MIRROR_DIR} where possible ===")
+        env.update(mirror_env())
+    if args.incremental:
+        print(f"\n=== Incremental mode: unchanged snippets that passed are carried over (each is rerun at least every {ROTATION_NIGHTS} nights) ===")
+        env[INCREMENTAL_ENV] = "1"
+    # Snippets running in-process, and the commands they start, see the same environment as child scripts
+    os.environ.update(env)
+
+    # Snippets on the docs pages the manifest does not list yet. They are only reported,
+    # except those run_discovered in scripts/snippets.toml allows, which are checked by exit code only.
+    if not args.no_discover:
+        print("\n=== Discovering snippets on the docs pages ===")
+        discovered = discover()
+        for snippet in discovered:
+            print(f"{snippet['id']}: {snippet['url']}{'' if snippet['runnable'] else ' (reported only, not in run_discovered)'}")
+        runnable = [snippet for snippet in discovered if snippet["runnable"]]
+        snippets = snippets + runnable
+        if args.snippet_processes:
+            # Engine processes read them from here instead of each scanning the docs pages again
+            save_discovered(runnable, DISCOVERED_FILE)
+
+    # The whole workload is known before any lane starts
+    print(f"\n=== {len(snippets)} snippets, {sum(lane['sdk'] in snippet for snippet in snippets for lane in SDK_LANES)} SDK checks ===")
+    
+    # Run every SDK lane concurrently (or one after another with --serial)
+    print(f"\n=== Running {len(SDK_LANES)} SDK lanes {'serially' if args.serial else 'concurrently'} ===")
+    with span("all lanes", "run"):
+        lane_results = asyncio.run(run_lanes())
 
-    # Clean up by removing all SDK directories
+    print("\n=== SDK lane summary ===")
+    for lane, lane_result in zip(SDK_LANES, lane_results):
+        print(f"{lane['name']}: {'✅ Completed' if lane_result else '❌ Setup failed'}")
+    print("\n================================================")
+
+    # Clean up by removing all SDK directories (snapshots of them are kept in .cache/env-snapshots)
     print("\n=== Cleaning up environment directories ===")
     sdk_dirs = [
         "/root/desktop/avail-js",
@@ -389,6 +505,13 @@ try:
         "/root/desktop/avail-go"
     ]
 
+    # The dependencies each environment resolved tonight, kept after the environments are gone
+    try:
+        archived = archive_run_lockfiles(RUN_ID, sdk_dirs)
+        print(f"Archived the lockfiles of {', '.join(archived) or 'no environment'} in {LOCKFILE_DIR}")
+    except Exception as e:
+        print(f"Error archiving lockfiles: {e}")
+
     import shutil
     for dir_path in sdk_dirs:
         try:
@@ -407,21 +530,55 @@ try:
     print("\n=== Script execution completed ===")
 
 finally:
-    # Restore stdout
+    # Stop toolchain processes (rustc, snippet binaries, node workers) that outlived their scripts
+    try:
+        print("\n=== Sweeping leftover processes of this run ===")
+        orphan_count = sweep_orphans(RUN_ID)
+        print(f"Stopped {orphan_count} leftover processes")
+    except Exception as e:
+        print(f"Error sweeping leftover processes: {e}")
+    
+    # Hit/miss statistics of the toolchain caches, then trim them to their disk budget
+    if caches_before is not None:
+        try:
+            print("\n=== Toolchain cache statistics ===")
+            caches_after = record_stats(RUN_ID, caches_before, RUN_STARTED_AT.timestamp())
+            evict_caches(CACHE_BUDGET_BYTES, caches_after)
+        except Exception as e:
+            print(f"Error updating toolchain caches: {e}")
+    
+    # Materialise run-results.json from the results journal before it is pushed
+    try:
+        record_count = compact_results(RESULTS_FILE)
+        print(f"\nCompacted {record_count} result journal records into {RESULTS_FILE}")
+        if args.incremental:
+            carried_over = sum(bool(record.get("details", {}).get("carried_over")) for record in read_journal() if "key" in record)
+            print(f"{carried_over} of them were carried over from earlier runs")
+    except Exception as e:
+        print(f"\nError compacting results journal: {e}")
+    
+    # Keep per-snippet exit codes and timings of this run in the local run history
+    try:
+        stored = record_run(RUN_ID, RUN_STARTED_AT.isoformat(), datetime.now().isoformat(), read_journal())
+        print(f"Stored {stored} results of run {RUN_ID} in {HISTORY_DB}")
+    except Exception as e:
+        print(f"Error storing run history: {e}")
+    
+    # Restore stdout and close the log, which has been written all along
     sys.stdout = output_capturer.terminal
+    output_capturer.close()
+    print(f"Saved complete log to {LOG_FILE}")
     
-    # Write all captured output to the log file
+    # Turn the spans recorded by all lanes into a Chrome trace next to the log
     try:
-        with open(LOG_FILE, 'w') as f:
-            f.write(output_capturer.get_content())
-        print(f"Saved complete log to {LOG_FILE}")
-        
-        # Push the results and logs to GitHub
-        push_success = push_to_github()
-        if push_success:
-            print("\n=== Git operations completed successfully ===")
-        else:
-            print("\n=== Git operations failed ===")
-            
+        event_count = export_chrome_trace(TRACE_EVENTS_FILE, TRACE_FILE)
+        print(f"Saved trace with {event_count} spans to {TRACE_FILE}")
     except Exception as e:
-        print(f"Error saving log file: {e}")
\ No newline at end of file
+        print(f"Error saving trace file: {e}")
+    
+    # Push the results and logs to GitHub
+    push_success = push_to_github()
+    if push_success:
+        print("\n=== Git operations completed successfully ===")
+    else:
+        print("\n=== Git operations failed ===")
\ No newline at end of file
@@ -0,0 +1,94 @@
+import os
+import shutil
+import hashlib
+from incremental import toolchain_version
+
+# Compiled snippet executables, one file per key, kept across runs (not pushed)
+CACHE_DIR = os.environ.get("NIGHTLY_BINARY_CACHE_DIR", "/root/desktop/.cache/snippet-binaries")
+# Least recently used executables are removed once the cache grows past this size
+CACHE_MAX_BYTES = int(os.environ.get("NIGHTLY_BINARY_CACHE_BYTES", str(4 * 1024 ** 3)))
+
+# Files of each SDK environment that decide how a snippet compiles, next to its source
+BUILD_FILES = {
+    "rust": ["Cargo.toml", "Cargo.lock"],
+    "go": ["go.mod", "go.sum"]
+}
+
+def is_cacheable(sdk_type):
+    """Rust and Go snippets compile to a standalone executable, JS snippets are transpiled by the harness"""
+    return sdk_type in BUILD_FILES
+
+def binary_key(sdk_type, target_dir, source):
+    """Content address of a snippet executable: its source, the build files of its environment and the toolchain"""
+    digest = hashlib.sha256()
+    digest.update(f"{sdk_type}\0{source}\0{toolchain_version(sdk_type)}\0".encode("utf-8"))
+    for build_file in BUILD_FILES[sdk_type]:
+        try:
+            with open(os.path.join(target_dir, build_file), "rb") as f:
+                digest.update(f.read())
+        except OSError:
+            digest.update(b"missing")
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def entry_path(key):
+    return os.path.join(CACHE_DIR, key)
+
+def cached_binary(key):
+    """Return the cached executable for a key, marking it as recently used, or None"""
+    path = entry_path(key)
+    try:
+        # The modification time orders the entries for eviction
+        os.utime(path)
+    except OSError:
+        return None
+    return path
+
+def restore_binary(key, destination):
+    """Copy the cached executable for a key to destination. Returns True on a hit."""
+    path = cached_binary(key)
+    if path is None:
+        return False
+    try:
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        # A copy, the build may later overwrite the destination in place
+        shutil.copy(path, destination)
+        return True
+    except OSError as e:
+        print(f"Warning: could not restore {destination} from the binary cache: {e}")
+        return False
+
+def store_binary(key, binary):
+    """Add a freshly built executable to the cache, then evict down to CACHE_MAX_BYTES"""
+    path = entry_path(key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        shutil.copy(binary, tmp_path)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: could not store {binary} in the binary cache: {e}")
+        return
+    evict(CACHE_MAX_BYTES)
+
+def evict(max_bytes):
+    """Remove the least recently used executables until the cache fits in max_bytes"""
+    entries = []
+    try:
+        with os.scandir(CACHE_DIR) as scan:
+            for entry in scan:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+    except OSError:
+        return
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            print(f"Evicted {os.path.basename(path)} from the binary cache")
+        except OSError:
+            pass
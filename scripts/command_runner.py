@@ -0,0 +1,409 @@
+import os
+import re
+import time
+import tempfile
+import shutil
+import signal
+import selectors
+import subprocess
+
+# Seconds a process may keep running after a success or failure marker before it is stopped
+MATCH_GRACE_PERIOD = float(os.environ.get("NIGHTLY_MATCH_GRACE_PERIOD", "2"))
+# Seconds between SIGTERM and SIGKILL when stopping a process group
+TERMINATE_TIMEOUT = 5
+# How long to keep reading output after the process itself has exited
+DRAIN_TIMEOUT = 0.2
+# Longest wait for output before checking whether the process has exited
+POLL_INTERVAL = 0.2
+# Seconds without any output after which a snippet is considered stuck (e.g. a hanging RPC call).
+# Above the ~20 s Avail block time, a snippet is quiet while it waits for its transaction's inclusion.
+# Snippets can set their own in scripts/snippets.toml.
+STALL_TIMEOUT = float(os.environ.get("NIGHTLY_STALL_TIMEOUT", "30"))
+# Seconds without output allowed while the toolchain is compiling or downloading dependencies
+COMPILE_STALL_TIMEOUT = float(os.environ.get("NIGHTLY_COMPILE_STALL_TIMEOUT", "300"))
+# Bytes of output kept in memory per stream of a command, the full output goes to its log file
+OUTPUT_TAIL_BYTES = int(os.environ.get("NIGHTLY_OUTPUT_TAIL_BYTES", str(64 * 1024)))
+# Directory receiving the full output of every command of the run (set by main.py)
+OUTPUT_DIR_ENV = "NIGHTLY_OUTPUT_DIR"
+
+# Toolchain progress lines, after which a quiet period is a compile step rather than a stall
+COMPILE_PROGRESS_MARKERS = [
+    "Compiling ",
+    "Downloading ",
+    "Downloaded ",
+    "Updating ",
+    "Locking ",
+    "Blocking waiting for file lock",
+    "go: downloading",
+    "go: finding",
+    "go: extracting",
+    "Progress: resolved",
+    "Packages: +"
+]
+# Commands that compile before the snippet prints anything (go run is silent while it builds)
+COMPILING_COMMANDS = ["cargo", "go", "ts-node", "npx", "pnpm"]
+
+# Output lines that mean a snippet has failed, even if it keeps running afterwards
+FAILURE_MARKERS = {
+    "js": ["UnhandledPromiseRejection", "Unhandled promise rejection"],
+    "rust": ["panicked at"],
+    "go": ["panic:"]
+}
+
+# Output lines (regular expressions) marking the phases of a snippet, in the order they usually happen.
+# The time of the first matching line of each phase is recorded relative to process start.
+COMMON_PHASE_MARKERS = {
+    "connect": [r"(?i)\bconnect(ed|ion established)\b", r"(?i)genesis hash", r"(?i)\bapi (is )?ready\b"],
+    "submit": [r"(?i)\b(submitted|submitting|signed|signing)\b", r"(?i)\btx ?hash\b", r"(?i)transaction hash"],
+    "in_block": [r"(?i)\bin ?block\b", r"(?i)included in block", r"(?i)\bblock hash\b"],
+    "finalized": [r"(?i)\bfinali[sz]ed\b"]
+}
+PHASE_MARKERS = {
+    "js": {
+        **COMMON_PHASE_MARKERS,
+        # avail-js-sdk logs its websocket connection through polkadot-js
+        "connect": COMMON_PHASE_MARKERS["connect"] + [r"API/INIT"]
+    },
+    "rust": {
+        **COMMON_PHASE_MARKERS,
+        "in_block": COMMON_PHASE_MARKERS["in_block"] + [r"(?i)\bblock_hash\b"]
+    },
+    "go": {
+        **COMMON_PHASE_MARKERS,
+        "in_block": COMMON_PHASE_MARKERS["in_block"] + [r"(?i)\bblockhash\b"]
+    }
+}
+
+def group_alive(pgid):
+    try:
+        os.killpg(pgid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+def signal_group(pgid, signum):
+    try:
+        os.killpg(pgid, signum)
+    except ProcessLookupError:
+        pass
+
+def stop_process(process):
+    """
+    Stop a process started by stream_command together with everything it
+    spawned (rustc, the compiled binary, node workers, ...): SIGTERM to its
+    process group, then SIGKILL to whatever is left after TERMINATE_TIMEOUT.
+    Returns True if the process itself was still running when it was
+    signalled, False if it had already exited (only descendants were left).
+    """
+    # The child leads its own session, so its pid is the process group id
+    pgid = process.pid
+    child_running = process.poll() is None
+    if not group_alive(pgid):
+        process.wait()
+        return False
+    signal_group(pgid, signal.SIGTERM)
+    deadline = time.monotonic() + TERMINATE_TIMEOUT
+    while time.monotonic() < deadline:
+        # Reap the child, an unreaped zombie still counts as a group member
+        process.poll()
+        if not group_alive(pgid):
+            break
+        time.sleep(0.05)
+    else:
+        print(f"Process group {pgid} still running after SIGTERM, sending SIGKILL")
+        signal_group(pgid, signal.SIGKILL)
+    process.wait()
+    return child_running
+
+def match_line(line, success_string, failure_markers):
+    """Return "success" or "failure" if the line contains one of the markers, else None"""
+    if success_string and success_string in line:
+        return "success"
+    for marker in failure_markers:
+        if marker in line:
+            return "failure"
+    return None
+
+def is_compile_progress(line):
+    return any(marker in line for marker in COMPILE_PROGRESS_MARKERS)
+
+class PhaseTracker:
+    """Seconds from process start to the first output line of each phase (see PHASE_MARKERS)"""
+
+    def __init__(self, phase_markers=None):
+        self.patterns = {
+            phase: [re.compile(pattern) for pattern in patterns]
+            for phase, patterns in (phase_markers or {}).items()
+        }
+        self.phases = {}
+
+    def observe(self, line, elapsed):
+        for phase, patterns in self.patterns.items():
+            if phase not in self.phases and any(pattern.search(line) for pattern in patterns):
+                self.phases[phase] = round(elapsed, 3)
+
+class OutputTail:
+    """
+    The last max_bytes of a stream, starting at a line boundary. Older output
+    is only counted, the complete stream is in the command's log file.
+    """
+
+    def __init__(self, max_bytes=OUTPUT_TAIL_BYTES):
+        self.max_bytes = max_bytes
+        self.buffer = bytearray()
+        self.omitted = 0
+
+    def append(self, data):
+        self.buffer += data
+        excess = len(self.buffer) - self.max_bytes
+        if excess > 0:
+            # Drop whole lines where possible
+            cut = self.buffer.find(b"\n", excess) + 1 or excess
+            del self.buffer[:cut]
+            self.omitted += cut
+
+    def text(self, log_path):
+        text = self.buffer.decode("utf-8", "replace")
+        if self.omitted:
+            return f"[... {self.omitted} bytes omitted, full output in {log_path}]\n{text}"
+        return text
+
+def output_log_path(log_name):
+    """Log file receiving the full output of a command, in the output directory of the run"""
+    output_dir = os.environ.get(OUTPUT_DIR_ENV) or os.path.join(tempfile.gettempdir(), "nightly-output")
+    os.makedirs(output_dir, exist_ok=True)
+    return os.path.join(output_dir, re.sub(r"[^\w.-]+", "_", log_name) + ".log")
+
+def prune_output_dirs(output_root, keep):
+    """Remove all but the newest `keep` run output directories (named by run id)"""
+    try:
+        run_dirs = sorted(os.listdir(output_root), reverse=True)
+    except FileNotFoundError:
+        return
+    for old_dir in run_dirs[keep:]:
+        print(f"Removing old run output {os.path.join(output_root, old_dir)}")
+        shutil.rmtree(os.path.join(output_root, old_dir), ignore_errors=True)
+
+def stream_command(
+    args,
+    cwd,
+    timeout,
+    success_string=None,
+    failure_markers=(),
+    grace_period=MATCH_GRACE_PERIOD,
+    stall_timeout=None,
+    compile_stall_timeout=COMPILE_STALL_TIMEOUT,
+    compiles_on_start=False,
+    log_name=None,
+    phase_markers=None
+):
+    """
+    Run a command in its own process group while reading its stdout and
+    stderr line by line. On timeout the whole group is stopped, not only
+    the direct child.
+    Once a line matches the success string or a failure marker, the process
+    gets grace_period seconds to exit on its own and is then stopped, instead
+    of waiting for snippets that keep their websocket open until the timeout.
+    With a stall_timeout the process is also stopped after that many seconds
+    without any output. While the last line was toolchain progress (e.g.
+    `Compiling ...`, `go: downloading ...`), or before the first output of a
+    command that compiles on start (compiles_on_start), the longer
+    compile_stall_timeout applies instead.
+    Only the last OUTPUT_TAIL_BYTES of stdout and stderr are kept in memory,
+    the complete output is appended line by line to the log file named
+    log_name (default: the program name) in the output directory of the run,
+    each line tagged with its time since process start (`[+1.234s] ...`).
+    With phase_markers, the time of the first line of each phase is recorded.
+
+    Returns a CompletedProcess whose stdout/stderr hold those tails and that
+    also carries:
+      duration       wall time in seconds
+      timed_out      True if the timeout expired or output stalled before any match (returncode None)
+      stalled        True if it was stopped by the stall watchdog
+      matched        "success", "failure" or None
+      stopped_early  True if the process was stopped after a match
+      success_seen   True if any line contained the success string
+      log_file       path of the log file with the complete output
+      phases         {phase: seconds since process start} of the matched phase markers
+    """
+    started = time.monotonic()
+    # A new session puts the command and all of its descendants in one process group
+    process = subprocess.Popen(
+        args,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True
+    )
+
+    log_file = output_log_path(log_name or os.path.basename(args[0]))
+    log = open(log_file, "ab")
+    log.write(f"$ {' '.join(args)} (in {cwd})\n".encode("utf-8"))
+
+    stdout_fd, stderr_fd = process.stdout.fileno(), process.stderr.fileno()
+    tails = {stdout_fd: OutputTail(), stderr_fd: OutputTail()}
+    # Output of each stream after its last complete line, a marker may be split across reads
+    pending = {fd: bytearray() for fd in tails}
+    selector = selectors.DefaultSelector()
+    for fd in tails:
+        selector.register(fd, selectors.EVENT_READ)
+
+    deadline = started + timeout if timeout is not None else float("inf")
+    matched = None
+    success_seen = False
+    timed_out = False
+    stalled = False
+    # Set when the loop ends because the process closed its output or exited
+    exited = False
+    # Set when the loop ends on the grace deadline after a match
+    grace_expired = False
+    last_output = started
+    compiling = compiles_on_start
+    phases = PhaseTracker(phase_markers)
+
+    def consume(fd, data):
+        """Spill complete lines to the log and the tail, and match them against the markers"""
+        nonlocal matched, success_seen, compiling, deadline
+        elapsed = time.monotonic() - started
+        prefix = f"[+{elapsed:.3f}s] ".encode("utf-8")
+        tails[fd].append(data)
+        for raw_line in data.splitlines(keepends=True):
+            log.write(prefix + raw_line)
+            line = raw_line.decode("utf-8", "replace")
+            phases.observe(line, elapsed)
+            compiling = is_compile_progress(line)
+            if success_string and success_string in line:
+                success_seen = True
+            if matched is None:
+                matched = match_line(line, success_string, failure_markers)
+                if matched:
+                    print(f"Matched {matched} marker: {line.strip()}")
+                    deadline = min(deadline, time.monotonic() + grace_period)
+
+    try:
+        while selector.get_map():
+            now = time.monotonic()
+            if now >= deadline:
+                timed_out = matched is None
+                grace_expired = matched is not None
+                break
+            stall_deadline = float("inf")
+            if stall_timeout is not None and matched is None:
+                stall_deadline = last_output + (compile_stall_timeout if compiling else stall_timeout)
+            if now >= stall_deadline:
+                print(f"No output for {now - last_output:.0f} seconds, stopping the command")
+                timed_out = stalled = True
+                break
+            # Woken up regularly to notice the process exiting while grandchildren keep the pipes open
+            wait = min(deadline - now, stall_deadline - now, POLL_INTERVAL)
+            if process.poll() is not None:
+                # Exited: only read what is already buffered (grandchildren may hold the pipes open)
+                wait = min(wait, DRAIN_TIMEOUT)
+            events = selector.select(timeout=wait)
+            if not events and process.poll() is not None:
+                exited = True
+                break
+
+            for key, _ in events:
+                chunk = os.read(key.fd, 65536)
+                if not chunk:
+                    selector.unregister(key.fd)
+                    continue
+                last_output = time.monotonic()
+                buffer = pending[key.fd]
+                buffer += chunk
+                end = buffer.rfind(b"\n") + 1
+                if end == 0:
+                    if len(buffer) < OUTPUT_TAIL_BYTES:
+                        continue
+                    # A line longer than the tail is handled in pieces
+                    end = len(buffer)
+                consume(key.fd, bytes(buffer[:end]))
+                del buffer[:end]
+        else:
+            exited = True
+    finally:
+        selector.close()
+        if exited:
+            # Closing its output usually means the process is exiting: reap it first, so
+            # its own exit status is kept and it does not count as stopped
+            try:
+                process.wait(timeout=TERMINATE_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                pass
+        # Also stops descendants left behind by a command that exited on its own
+        signalled = stop_process(process)
+        # Only a process still running when the grace period after a match ran out was stopped early
+        stopped_early = grace_expired and signalled
+        process.stdout.close()
+        process.stderr.close()
+        # Output without a final newline
+        for fd, buffer in pending.items():
+            if buffer:
+                consume(fd, bytes(buffer) + b"\n")
+        log.close()
+
+    result = subprocess.CompletedProcess(
+        args,
+        None if timed_out else process.returncode,
+        tails[stdout_fd].text(log_file),
+        tails[stderr_fd].text(log_file)
+    )
+    result.duration = time.monotonic() - started
+    result.timed_out = timed_out
+    result.stalled = stalled
+    result.matched = matched
+    result.stopped_early = stopped_early
+    result.success_seen = success_seen
+    result.log_file = log_file
+    result.phases = phases.phases
+    return result
+
+def process_running(pid):
+    """True if the process exists and is not a zombie waiting to be reaped"""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            state = f.read().rsplit(")", 1)[1].split()[0]
+        return state not in ("Z", "X")
+    except (OSError, IndexError):
+        return False
+
+def sweep_orphans(run_id):
+    """
+    Stop processes of this run that outlived the script that started them,
+    found through the NIGHTLY_RUN_ID every child inherits from main.py.
+    Returns the number of processes stopped.
+    """
+    marker = f"NIGHTLY_RUN_ID={run_id}".encode("utf-8")
+    orphans = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit() or int(entry) == os.getpid() or not process_running(entry):
+            continue
+        try:
+            with open(f"/proc/{entry}/environ", "rb") as f:
+                if marker in f.read().split(b"\0"):
+                    orphans.append(int(entry))
+        except OSError:
+            # Exited meanwhile or not ours
+            continue
+
+    found = len(orphans)
+    for pid in orphans:
+        print(f"Stopping leftover process {pid}")
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    deadline = time.monotonic() + TERMINATE_TIMEOUT
+    while orphans and time.monotonic() < deadline:
+        orphans = [pid for pid in orphans if process_running(pid)]
+        time.sleep(0.1)
+    for pid in orphans:
+        print(f"Process {pid} still running after SIGTERM, sending SIGKILL")
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    return found
@@ -0,0 +1,128 @@
+import os
+import shutil
+import subprocess
+
+# Set by main.py --mirror: dependencies are fetched from the local mirror first
+MIRROR_ENV = "NIGHTLY_DEPENDENCY_MIRROR"
+# Local copies of the npm metadata, crates and Go modules the SDK environments use, kept across runs (not pushed)
+MIRROR_DIR = os.environ.get("NIGHTLY_MIRROR_DIR", "/root/desktop/.cache/mirror")
+# A GOPROXY file tree (the layout of the module download cache)
+GO_PROXY_DIR = os.path.join(MIRROR_DIR, "goproxy")
+# A cargo directory source written by `cargo vendor`, with the source replacement config it printed
+CARGO_VENDOR_DIR = os.path.join(MIRROR_DIR, "cargo-vendor")
+CARGO_VENDOR_CONFIG = os.path.join(CARGO_VENDOR_DIR, "nightly-source-config.toml")
+# pnpm metadata cache, used without revalidation next to the package store
+PNPM_METADATA_DIR = os.path.join(MIRROR_DIR, "pnpm-metadata")
+# Modules not in the mirror yet still come from the public proxy
+UPSTREAM_GOPROXY = "https://proxy.golang.org,direct"
+# Timeout for vendoring every crate of the Rust environment
+VENDOR_TIMEOUT = 600
+
+def mirror_enabled():
+    return os.environ.get(MIRROR_ENV) == "1"
+
+def mirror_env():
+    """
+    Environment variables pointing the toolchains at the mirror. Go falls back
+    to the public proxy for modules the file proxy does not have, and pnpm only
+    asks the registry for metadata and packages it has not cached yet.
+    """
+    for directory in (GO_PROXY_DIR, PNPM_METADATA_DIR):
+        os.makedirs(directory, exist_ok=True)
+    return {
+        MIRROR_ENV: "1",
+        "GOPROXY": f"file://{GO_PROXY_DIR},{UPSTREAM_GOPROXY}",
+        "npm_config_cache_dir": PNPM_METADATA_DIR,
+        "npm_config_prefer_offline": "true"
+    }
+
+def refresh_go_mirror():
+    """
+    Copy the modules downloaded by `go get` into the file proxy, only adding
+    what it does not have yet. Returns the number of files added.
+    """
+    try:
+        result = subprocess.run(["go", "env", "GOMODCACHE"], capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"Could not locate the Go module cache: {e}")
+        return 0
+    download_dir = os.path.join(result.stdout.strip(), "cache", "download")
+    if result.returncode != 0 or not os.path.isdir(download_dir):
+        print("No Go module downloads to mirror")
+        return 0
+
+    added = 0
+    for root, _, files in os.walk(download_dir):
+        mirror_root = os.path.join(GO_PROXY_DIR, os.path.relpath(root, download_dir))
+        for name in files:
+            if name.endswith((".lock", ".partial", ".tmp")):
+                continue
+            source = os.path.join(root, name)
+            destination = os.path.join(mirror_root, name)
+            os.makedirs(mirror_root, exist_ok=True)
+            if name == "list":
+                # Versions of a module, the mirror keeps the ones of earlier runs too
+                merge_version_list(source, destination)
+            elif not os.path.exists(destination):
+                shutil.copyfile(source, destination)
+                added += 1
+    print(f"Added {added} files to the Go module mirror in {GO_PROXY_DIR}")
+    return added
+
+def merge_version_list(source, destination):
+    versions = set()
+    for path in (source, destination):
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                versions.update(line.strip() for line in f if line.strip())
+    with open(destination, "w", encoding="utf-8") as f:
+        f.write("".join(f"{version}\n" for version in sorted(versions)))
+
+def cargo_config_path(target_dir):
+    return os.path.join(target_dir, ".cargo", "config.toml")
+
+def write_cargo_config(target_dir):
+    """
+    Point the crate at the vendored mirror through its own .cargo/config.toml
+    when mirror mode is on and the mirror was populated, else remove that config.
+    Returns True if the mirror is used.
+    """
+    if not mirror_enabled() or not os.path.exists(CARGO_VENDOR_CONFIG):
+        remove_cargo_config(target_dir)
+        return False
+    os.makedirs(os.path.dirname(cargo_config_path(target_dir)), exist_ok=True)
+    shutil.copyfile(CARGO_VENDOR_CONFIG, cargo_config_path(target_dir))
+    print(f"Using the cargo dependency mirror in {CARGO_VENDOR_DIR}")
+    return True
+
+def remove_cargo_config(target_dir):
+    try:
+        os.remove(cargo_config_path(target_dir))
+    except FileNotFoundError:
+        pass
+
+def refresh_cargo_mirror(target_dir):
+    """
+    Vendor every crate of the crate's lockfile into the mirror, keeping the
+    crates vendored on earlier runs. Returns True on success.
+    """
+    print(f"\n=== Refreshing the cargo dependency mirror in {CARGO_VENDOR_DIR} ===")
+    try:
+        result = subprocess.run(
+            ["cargo", "vendor", "--no-delete", "--versioned-dirs", CARGO_VENDOR_DIR],
+            cwd=target_dir,
+            capture_output=True,
+            text=True,
+            timeout=VENDOR_TIMEOUT
+        )
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"Error vendoring crates: {e}")
+        return False
+    if result.returncode != 0:
+        print(f"cargo vendor failed with return code {result.returncode}:\n{result.stderr}")
+        return False
+    # cargo vendor prints the source replacement (crates.io and any git sources) to use the vendored crates
+    with open(CARGO_VENDOR_CONFIG, "w", encoding="utf-8") as f:
+        f.write(result.stdout)
+    print("Cargo dependency mirror refreshed")
+    return True
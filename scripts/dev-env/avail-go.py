@@ -1,11 +1,19 @@
 import os
-import re
 import subprocess
 import sys
-import requests
 from pathlib import Path
 from dotenv import load_dotenv
 
+# Make the shared modules in scripts/ importable
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(script_dir))
+from docs_cache import fetch_cached
+from docs_parser import parse_markdown
+from env_snapshots import recipe_key, restore_snapshot, save_snapshot
+from lockfiles import restore_lockfiles, save_lockfiles
+from run_trace import span
+from dependency_mirror import mirror_enabled, refresh_go_mirror
+
 # Load environment variables from .env file in the desktop directory
 load_dotenv("/root/desktop/.env")
 
@@ -13,31 +21,19 @@ load_dotenv("/root/desktop/.env")
 TARGET_DIR = "/root/desktop/avail-go"
 # URL for the markdown documentation
 DOCS_URL = "https://raw.githubusercontent.com/availproject/docs/refs/heads/main/app/api-reference/avail-node-api/page.mdx"
+# Docs blocks that define this environment, hashed into the snapshot key
+SETUP_BLOCKS = ["cmd14", "cmd15", "cmd16", "cmd17", "cmd18"]
+# Setup commands that resolve dependencies, downloading the modules of the restored go.mod/go.sum replaces them
+DEPENDENCY_COMMANDS = ("go mod init", "go get")
 
 def fetch_markdown():
-    """Fetch the markdown content from the URL"""
+    """Fetch the markdown content from the URL, going through the docs cache"""
     print(f"Fetching markdown from {DOCS_URL}")
-    response = requests.get(DOCS_URL)
-    if response.status_code != 200:
-        print(f"Error fetching markdown: {response.status_code}")
+    with span("fetch docs", "fetch", url=DOCS_URL):
+        markdown = fetch_cached(DOCS_URL)
+    if markdown is None:
         sys.exit(1)
-    return response.text
-
-def extract_command(markdown, cmd_name):
-    """Extract a specific terminal command from markdown by name"""
-    pattern = f'```bash filename="terminal" name="{cmd_name}"\\s+(.*?)\\s+```'
-    match = re.search(pattern, markdown, re.DOTALL)
-    if match:
-        return match.group(1).strip()
-    return None
-
-def extract_content(markdown, content_name):
-    """Extract content from markdown by name - works for any type of code block"""
-    pattern = f'```.*?name="{content_name}"\\s+(.*?)\\s+```'
-    match = re.search(pattern, markdown, re.DOTALL)
-    if match:
-        return match.group(1).strip()
-    return None
+    return markdown
 
 def create_directory():
     """Create the target directory if it doesn't exist, or delete and recreate it if it does"""
@@ -82,7 +78,9 @@ def run_command(command):
     try:
         # Split command into args for subprocess
         cmd_args = command.split()
-        result = subprocess.run(cmd_args, cwd=TARGET_DIR, capture_output=True, text=True)
+        with span("setup command", "setup", command=command) as command_span:
+            result = subprocess.run(cmd_args, cwd=TARGET_DIR, capture_output=True, text=True)
+            command_span["returncode"] = result.returncode
         print(f"Command output: {result.stdout}")
         if result.stderr:
             print(f"Error output: {result.stderr}")
@@ -118,20 +116,57 @@ def write_env_file(content):
         print(f"Error writing to .env file: {e}")
         sys.exit(1)
 
+def run_dependency_command(command, frozen):
+    """Run a setup command, without its dependency parts when the modules came from the lockfile"""
+    if frozen:
+        command = " && ".join(part.strip() for part in command.split("&&") if not part.strip().startswith(DEPENDENCY_COMMANDS))
+        if not command:
+            print("Already installed from the lockfile")
+            return True
+    return run_command(command)
+
+def install_frozen(document):
+    """
+    Download exactly the modules an earlier run resolved for the same setup
+    blocks, instead of resolving them again. Returns (lockfile key, installed).
+    """
+    lockfile_key = recipe_key([document.content(name) for name in SETUP_BLOCKS])
+    if not restore_lockfiles(os.path.basename(TARGET_DIR), lockfile_key, TARGET_DIR):
+        return lockfile_key, False
+    # Checks every module against go.sum
+    if run_command("go mod download"):
+        return lockfile_key, True
+    print("Downloading the locked modules failed, resolving dependencies again")
+    create_directory()
+    return lockfile_key, False
+
 def main():
+    # Fetch markdown content and index its code blocks once
+    document = parse_markdown(fetch_markdown())
+    
+    # The setup commands, config contents and this script itself define the environment
+    snapshot_key = recipe_key([Path(__file__).read_text()] + [document.content(name) for name in SETUP_BLOCKS])
+    
+    # Reuse the environment built from the same recipe on a previous run
+    if restore_snapshot(os.path.basename(TARGET_DIR), snapshot_key, TARGET_DIR):
+        # The seed phrase is not part of the recipe, so always rewrite .env
+        write_env_file(document.content("cmd18"))
+        print("Go development environment restored from snapshot!")
+        return
+    
     # Create the target directory
     create_directory()
     
-    # Fetch markdown content
-    markdown = fetch_markdown()
+    # The same setup blocks as an earlier run declare the same versions, reuse its go.mod and go.sum
+    lockfile_key, frozen = install_frozen(document)
 
     # Extract command cmd14 - Go mod init
-    cmd14 = extract_command(markdown, "cmd14")
+    cmd14 = document.command("cmd14")
     if cmd14:
         print(f"Found command cmd14: {cmd14}")
         # Replace project name with our directory name
         cmd14 = cmd14.replace("your-project-name", "avail-go")
-        success = run_command(cmd14)
+        success = run_dependency_command(cmd14, frozen)
         print(f"Command execution {'succeeded' if success else 'failed'}")
         if not success:
             sys.exit(1)
@@ -140,10 +175,10 @@ def main():
         sys.exit(1)
 
     # Extract command cmd15 - Install avail-go-sdk
-    cmd15 = extract_command(markdown, "cmd15")
+    cmd15 = document.command("cmd15")
     if cmd15:
         print(f"Found command cmd15: {cmd15}")
-        success = run_command(cmd15)
+        success = run_dependency_command(cmd15, frozen)
         print(f"Command execution {'succeeded' if success else 'failed'}")
         if not success:
             sys.exit(1)
@@ -152,10 +187,10 @@ def main():
         sys.exit(1)
 
     # Extract command cmd16 - Install godotenv
-    cmd16 = extract_command(markdown, "cmd16")
+    cmd16 = document.command("cmd16")
     if cmd16:
         print(f"Found command cmd16: {cmd16}")
-        success = run_command(cmd16)
+        success = run_dependency_command(cmd16, frozen)
         print(f"Command execution {'succeeded' if success else 'failed'}")
         if not success:
             sys.exit(1)
@@ -164,7 +199,7 @@ def main():
         sys.exit(1)
 
     # Extract command cmd17 - Create .env file
-    cmd17 = extract_command(markdown, "cmd17")
+    cmd17 = document.command("cmd17")
     if cmd17:
         print(f"Found command cmd17: {cmd17}")
         success = run_command(cmd17)
@@ -176,7 +211,7 @@ def main():
         sys.exit(1)
 
     # Extract content cmd18 - Write to .env file
-    env_content = extract_content(markdown, "cmd18")
+    env_content = document.content("cmd18")
     if env_content:
         print("Found .env content")
         success = write_env_file(env_content)
@@ -194,6 +229,14 @@ def main():
         print(f"Error creating main.go file: {e}")
         sys.exit(1)
 
+    # With main.py --mirror, the modules `go get` just downloaded are served by the local file proxy next time
+    if mirror_enabled():
+        refresh_go_mirror()
+
+    # Keep the resolved lockfile and the freshly built environment for the next runs
+    save_lockfiles(os.path.basename(TARGET_DIR), lockfile_key, TARGET_DIR)
+    save_snapshot(os.path.basename(TARGET_DIR), snapshot_key, TARGET_DIR)
+
     print("Go development environment setup completed successfully!")
 
 if __name__ == "__main__":
@@ -1,12 +1,19 @@
 #!/usr/bin/env python3
 import os
-import re
 import subprocess
 import sys
-import requests
 from pathlib import Path
 from dotenv import load_dotenv
 
+# Make the shared modules in scripts/ importable
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(script_dir))
+from docs_cache import fetch_cached
+from docs_parser import parse_markdown
+from env_snapshots import recipe_key, restore_snapshot, save_snapshot
+from lockfiles import restore_lockfiles, save_lockfiles
+from run_trace import span
+
 # Load environment variables from .env file in the desktop directory
 load_dotenv("/root/desktop/.env")
 
@@ -14,32 +21,19 @@ load_dotenv("/root/desktop/.env")
 TARGET_DIR = "/root/desktop/avail-js"
 # URL for the markdown documentation
 DOCS_URL = "https://raw.githubusercontent.com/availproject/docs/refs/heads/main/app/api-reference/avail-node-api/page.mdx"
+# Docs blocks that define this environment, hashed into the snapshot key
+SETUP_BLOCKS = ["cmd2", "cmd3", "cmd5", "cmd6", "cmd7", "cmd8"]
+# Setup commands that resolve dependencies, a frozen install from the lockfile replaces them
+DEPENDENCY_COMMANDS = ("pnpm init", "pnpm add")
 
 def fetch_markdown():
-    """Fetch the markdown content from the URL"""
+    """Fetch the markdown content from the URL, going through the docs cache"""
     print(f"Fetching markdown from {DOCS_URL}")
-    response = requests.get(DOCS_URL)
-    if response.status_code != 200:
-        print(f"Error fetching markdown: {response.status_code}")
+    with span("fetch docs", "fetch", url=DOCS_URL):
+        markdown = fetch_cached(DOCS_URL)
+    if markdown is None:
         sys.exit(1)
-    return response.text
-
-def extract_command(markdown, cmd_name):
-    """Extract a specific terminal command from markdown by name"""
-    pattern = f'```bash filename="terminal" name="{cmd_name}"\\s+(.*?)\\s+```'
-    match = re.search(pattern, markdown, re.DOTALL)
-    if match:
-        return match.group(1).strip()
-    return None
-
-def extract_content(markdown, content_name):
-    """Extract content from markdown by name - works for any type of code block"""
-    # Pattern matches any code block with name="cmd6" regardless of language
-    pattern = f'```.*?name="{content_name}"\\s+(.*?)\\s+```'
-    match = re.search(pattern, markdown, re.DOTALL)
-    if match:
-        return match.group(1).strip()
-    return None
+    return markdown
 
 def write_tsconfig(content):
     """Write content to tsconfig.json file"""
@@ -136,7 +130,9 @@ def run_command(command):
     try:
         # Split command into args for subprocess
         cmd_args = command.split()
-        result = subprocess.run(cmd_args, cwd=TARGET_DIR, capture_output=True, text=True)
+        with span("setup command", "setup", command=command) as command_span:
+            result = subprocess.run(cmd_args, cwd=TARGET_DIR, capture_output=True, text=True)
+            command_span["returncode"] = result.returncode
         print(f"Command output: {result.stdout}")
         if result.stderr:
             print(f"Error output: {result.stderr}")
@@ -145,19 +141,55 @@ def run_command(command):
         print(f"Error executing command: {e}")
         return False
 
+def run_dependency_command(command, frozen):
+    """Run a setup command, without its dependency parts when they were installed from the lockfile"""
+    if frozen:
+        command = " && ".join(part.strip() for part in command.split("&&") if not part.strip().startswith(DEPENDENCY_COMMANDS))
+        if not command:
+            print("Already installed from the lockfile")
+            return True
+    return run_command(command)
+
+def install_frozen(document):
+    """
+    Install exactly the dependencies an earlier run resolved for the same setup
+    blocks, instead of resolving them again. Returns (lockfile key, installed).
+    """
+    lockfile_key = recipe_key([document.content(name) for name in SETUP_BLOCKS])
+    if not restore_lockfiles(os.path.basename(TARGET_DIR), lockfile_key, TARGET_DIR):
+        return lockfile_key, False
+    if run_command("pnpm install --frozen-lockfile"):
+        return lockfile_key, True
+    print("Frozen install failed, resolving dependencies again")
+    create_directory()
+    return lockfile_key, False
+
 def main():
+    # Fetch markdown content and index its code blocks once
+    document = parse_markdown(fetch_markdown())
+    
+    # The setup commands, config contents and this script itself define the environment
+    snapshot_key = recipe_key([Path(__file__).read_text()] + [document.content(name) for name in SETUP_BLOCKS])
+    
+    # Reuse the environment built from the same recipe on a previous run
+    if restore_snapshot(os.path.basename(TARGET_DIR), snapshot_key, TARGET_DIR):
+        # The seed phrase is not part of the recipe, so always rewrite .env
+        write_env_file(document.content("cmd8"))
+        print("Avail JS development environment restored from snapshot!")
+        return
+    
     # Create the directory
     create_directory()
     
-    # Fetch markdown content
-    markdown = fetch_markdown()
+    # The same setup blocks as an earlier run declare the same versions, reuse its lockfile
+    lockfile_key, frozen = install_frozen(document)
     
     # Extract command cmd2
     # Run `pnpm init to initialize the JS project`
-    cmd2 = extract_command(markdown, "cmd2")
+    cmd2 = document.command("cmd2")
     if cmd2:
         print(f"Found command cmd2: {cmd2}")
-        success = run_command(cmd2)
+        success = run_dependency_command(cmd2, frozen)
         print(f"Command execution {'succeeded' if success else 'failed'}")
         if not success:
             sys.exit(1)  # Exit if command execution failed
@@ -167,10 +199,10 @@ def main():
 
     # Extract command cmd3
     # Run `pnpm add avail-js-sdk@0.4.0` to install the avail-js-sdk
-    cmd3 = extract_command(markdown, "cmd3")
+    cmd3 = document.command("cmd3")
     if cmd3:
         print(f"Found command cmd3: {cmd3}")
-        success = run_command(cmd3)
+        success = run_dependency_command(cmd3, frozen)
         print(f"Command execution {'succeeded' if success else 'failed'}")
         if not success:
             sys.exit(1)  # Exit if command execution failed
@@ -181,7 +213,7 @@ def main():
 
     # Extract command cmd5
     # Run `touch tsconfig.json` to create the tsconfig.json file
-    cmd5 = extract_command(markdown, "cmd5")
+    cmd5 = document.command("cmd5")
     if cmd5:
         print(f"Found command cmd5: {cmd5}")
         success = run_command(cmd5)
@@ -194,7 +226,7 @@ def main():
     
     # Extract content cmd6
     # Extract tsconfig.json content and write to file
-    tsconfig_content = extract_content(markdown, "cmd6")
+    tsconfig_content = document.content("cmd6")
     if tsconfig_content:
         print("Found tsconfig.json content")
         success = write_tsconfig(tsconfig_content)
@@ -204,10 +236,10 @@ def main():
 
     # Extract command cmd7
     # run `pnpm add dotenv && touch .env` to install dotenv and create .env file
-    cmd7 = extract_command(markdown, "cmd7")
+    cmd7 = document.command("cmd7")
     if cmd7:
         print(f"Found command cmd7: {cmd7}")
-        success = run_command(cmd7)
+        success = run_dependency_command(cmd7, frozen)
         print(f"Command execution {'succeeded' if success else 'failed'}")
         if not success:
             sys.exit(1)  # Exit if command execution failed
@@ -217,7 +249,7 @@ def main():
 
     # Extract content cmd8
     # Write to .env file
-    env_content = extract_content(markdown, "cmd8")
+    env_content = document.content("cmd8")
     if env_content:
         print("Found .env content")
         success = write_env_file(env_content)
@@ -238,6 +270,10 @@ def main():
     else:
         print(f"File already exists: {ts_file_path}")
 
+    # Keep the resolved lockfile and the freshly built environment for the next runs
+    save_lockfiles(os.path.basename(TARGET_DIR), lockfile_key, TARGET_DIR)
+    save_snapshot(os.path.basename(TARGET_DIR), snapshot_key, TARGET_DIR)
+
     print("Avail JS development environment setup completed successfully!")
 
 if __name__ == "__main__":
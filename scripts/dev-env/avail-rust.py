@@ -1,11 +1,20 @@
 import os
-import re
 import subprocess
 import sys
-import requests
 from pathlib import Path
 from dotenv import load_dotenv
 
+# Make the shared modules in scripts/ importable
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(script_dir))
+from docs_cache import fetch_cached
+from docs_parser import parse_markdown
+from env_snapshots import recipe_key, restore_snapshot, save_snapshot
+from lockfiles import restore_lockfiles, save_lockfiles
+from run_trace import span
+from command_runner import stream_command, COMPILE_STALL_TIMEOUT
+from dependency_mirror import mirror_enabled, write_cargo_config, remove_cargo_config, refresh_cargo_mirror
+
 # Load environment variables from .env file in the desktop directory
 load_dotenv("/root/desktop/.env")
 
@@ -13,32 +22,17 @@ load_dotenv("/root/desktop/.env")
 TARGET_DIR = "/root/desktop/avail-rust"
 # URL for the markdown documentation
 DOCS_URL = "https://raw.githubusercontent.com/availproject/docs/refs/heads/main/app/api-reference/avail-node-api/page.mdx"
+# Docs blocks that define this environment, hashed into the snapshot key
+SETUP_BLOCKS = ["cmd9", "cmd10", "cmd11", "cmd12"]
 
 def fetch_markdown():
-    """Fetch the markdown content from the URL"""
+    """Fetch the markdown content from the URL, going through the docs cache"""
     print(f"Fetching markdown from {DOCS_URL}")
-    response = requests.get(DOCS_URL)
-    if response.status_code != 200:
-        print(f"Error fetching markdown: {response.status_code}")
+    with span("fetch docs", "fetch", url=DOCS_URL):
+        markdown = fetch_cached(DOCS_URL)
+    if markdown is None:
         sys.exit(1)
-    return response.text
-
-def extract_command(markdown, cmd_name):
-    """Extract a specific terminal command from markdown by name"""
-    pattern = f'```bash filename="terminal" name="{cmd_name}"\\s+(.*?)\\s+```'
-    match = re.search(pattern, markdown, re.DOTALL)
-    if match:
-        return match.group(1).strip()
-    return None
-
-def extract_content(markdown, content_name):
-    """Extract content from markdown by name - works for any type of code block"""
-    # Pattern matches any code block with name="cmd6" regardless of language
-    pattern = f'```.*?name="{content_name}"\\s+(.*?)\\s+```'
-    match = re.search(pattern, markdown, re.DOTALL)
-    if match:
-        return match.group(1).strip()
-    return None
+    return markdown
 
 def write_cargo_toml(content):
     """Write content to Cargo.toml file"""
@@ -135,7 +129,9 @@ def run_command(command):
     try:
         # Split command into args for subprocess
         cmd_args = command.split()
-        result = subprocess.run(cmd_args, cwd=TARGET_DIR, capture_output=True, text=True)
+        with span("setup command", "setup", command=command) as command_span:
+            result = subprocess.run(cmd_args, cwd=TARGET_DIR, capture_output=True, text=True)
+            command_span["returncode"] = result.returncode
         print(f"Command output: {result.stdout}")
         if result.stderr:
             print(f"Error output: {result.stderr}")
@@ -143,17 +139,71 @@ def run_command(command):
     except Exception as e:
         print(f"Error executing command: {e}")
         return False
+
+def precompile_dependencies(locked=False):
+    """
+    Build the crate once so its dependencies are compiled before the snippets.
+    locked builds exactly the restored Cargo.lock. Returns True on success.
+    """
+    command = ["cargo", "build"] + (["--locked"] if locked else [])
+    try:
+        # Run this long-running command in its own process group with a longer timeout,
+        # so a timeout also stops the rustc processes cargo started
+        with span("cargo build", "compile", command=" ".join(command)):
+            result = stream_command(
+                command,
+                TARGET_DIR,
+                timeout=900,  # 15 minutes timeout
+                stall_timeout=COMPILE_STALL_TIMEOUT,
+                log_name="rust-cargo-build"
+            )
+        
+        if result.stalled:
+            print(f"Cargo build made no progress for {COMPILE_STALL_TIMEOUT} seconds")
+            return False
+        if result.timed_out:
+            print("Cargo build timed out after 900 seconds")
+            return False
+        
+        print("Cargo build output:")
+        print(result.stdout)
+        
+        if result.stderr:
+            print("Cargo build stderr:")
+            print(result.stderr)
+            
+        if result.returncode != 0:
+            print(f"Cargo build failed with return code {result.returncode}")
+            return False
+        print("Cargo build completed successfully")
+        return True
+            
+    except Exception as e:
+        print(f"Error during cargo build: {e}")
+        return False
     
 def main():
+    # Fetch markdown content and index its code blocks once
+    document = parse_markdown(fetch_markdown())
+    
+    # The setup commands, config contents and this script itself define the environment
+    snapshot_key = recipe_key([Path(__file__).read_text()] + [document.content(name) for name in SETUP_BLOCKS])
+    
+    # Reuse the environment built from the same recipe on a previous run
+    if restore_snapshot(os.path.basename(TARGET_DIR), snapshot_key, TARGET_DIR):
+        # The seed phrase is not part of the recipe, so always rewrite .env
+        write_env_file(document.content("cmd12"))
+        # Neither is the dependency mirror (main.py --mirror)
+        write_cargo_config(TARGET_DIR)
+        print("Rust development environment restored from snapshot!")
+        return
+    
     # Create the directory
     create_directory()
-    
-    # Fetch markdown content
-    markdown = fetch_markdown()
 
     # Extract command cmd9
     # To initialize the rust project
-    cmd9 = extract_command(markdown, "cmd9")
+    cmd9 = document.command("cmd9")
     if cmd9:
         print(f"Found command cmd9: {cmd9}")
         success = run_command(cmd9)
@@ -166,7 +216,7 @@ def main():
 
     # Extract content cmd10
     # Extract Cargo.toml content and write to file
-    cargo_content = extract_content(markdown, "cmd10")
+    cargo_content = document.content("cmd10")
     if cargo_content:
         print("Found Cargo.toml content")
         # Update the project name to match our directory name
@@ -178,7 +228,7 @@ def main():
         
     # Extract command cmd11
     # Run `touch .env` to create the .env file
-    cmd11 = extract_command(markdown, "cmd11")
+    cmd11 = document.command("cmd11")
     if cmd11:
         print(f"Found command cmd11: {cmd11}")
         success = run_command(cmd11)
@@ -191,7 +241,7 @@ def main():
 
     # Extract content cmd12
     # Write to .env file
-    env_content = extract_content(markdown, "cmd12")
+    env_content = document.content("cmd12")
     if env_content:
         print("Found .env content")
         success = write_env_file(env_content)
@@ -200,35 +250,32 @@ def main():
         sys.exit(1)    
     # Add cargo build with timeout to pre-compile dependencies
     print("\n=== Pre-compiling Rust dependencies (this may take several minutes) ===")
-    try:
-        # Use subprocess directly for this long-running command to set a longer timeout
-        result = subprocess.run(
-            ["cargo", "build"], 
-            cwd=TARGET_DIR, 
-            capture_output=True, 
-            text=True,
-            timeout=900  # 15 minutes timeout
-        )
-        
-        print("Cargo build output:")
-        print(result.stdout)
-        
-        if result.stderr:
-            print("Cargo build stderr:")
-            print(result.stderr)
-            
-        if result.returncode != 0:
-            print(f"Cargo build failed with return code {result.returncode}")
-            sys.exit(1)
-        else:
-            print("Cargo build completed successfully")
-            
-    except subprocess.TimeoutExpired:
-        print("Cargo build timed out after 900 seconds")
-        sys.exit(1)
-    except Exception as e:
-        print(f"Error during cargo build: {e}")
+    # The same setup blocks as an earlier run declare the same versions, build its Cargo.lock as is
+    lockfile_key = recipe_key([document.content(name) for name in SETUP_BLOCKS])
+    locked = restore_lockfiles(os.path.basename(TARGET_DIR), lockfile_key, TARGET_DIR)
+    # With main.py --mirror the crates come from the local mirror once it has them
+    from_mirror = write_cargo_config(TARGET_DIR)
+    success = precompile_dependencies(locked)
+    if not success and locked:
+        print("Locked cargo build failed, resolving dependencies again")
+        locked = False
+        success = precompile_dependencies()
+    if not success and from_mirror:
+        # e.g. the docs moved to an SDK version whose crates are not mirrored yet
+        print("Cargo build against the dependency mirror failed, retrying against the registry")
+        remove_cargo_config(TARGET_DIR)
+        from_mirror = False
+        success = precompile_dependencies()
+    if not success:
         sys.exit(1)
+    if mirror_enabled() and not from_mirror:
+        # Fetched from the registry this time, so the next runs find these crates in the mirror
+        if refresh_cargo_mirror(TARGET_DIR):
+            write_cargo_config(TARGET_DIR)
+
+    # Keep the resolved lockfile and the freshly built environment for the next runs
+    save_lockfiles(os.path.basename(TARGET_DIR), lockfile_key, TARGET_DIR)
+    save_snapshot(os.path.basename(TARGET_DIR), snapshot_key, TARGET_DIR)
 
     print("Rust development environment setup completed successfully!")
 
@@ -0,0 +1,125 @@
+import os
+import json
+import hashlib
+import requests
+from datetime import datetime
+
+# Directory holding the cached docs pages (one body + one metadata file per URL)
+CACHE_DIR = os.environ.get("NIGHTLY_DOCS_CACHE_DIR", "/root/desktop/.cache/docs")
+# Timeout for a single request to the docs host
+REQUEST_TIMEOUT = 30
+
+# Pages already read by this process
+_memory_cache = {}
+# Reuse the connection to raw.githubusercontent.com across fetches
+_session = requests.Session()
+
+def is_offline():
+    """Offline mode only serves pages from the cache (set by main.py --offline)"""
+    return os.environ.get("NIGHTLY_OFFLINE") == "1"
+
+def current_run_id():
+    """Id of the current nightly run, shared by main.py with all child scripts"""
+    return os.environ.get("NIGHTLY_RUN_ID")
+
+def cache_paths(url):
+    """Return the (body, metadata) cache file paths for a URL"""
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.body"), os.path.join(CACHE_DIR, f"{key}.json")
+
+def read_entry(url):
+    """Read a cached page, returns (body, metadata) or (None, None)"""
+    body_path, meta_path = cache_paths(url)
+    try:
+        with open(meta_path, 'r') as f:
+            metadata = json.load(f)
+        with open(body_path, 'r', encoding="utf-8") as f:
+            body = f.read()
+        return body, metadata
+    except (OSError, ValueError):
+        return None, None
+
+def write_atomic(path, content):
+    """Write a file through a temporary file so concurrent lanes never see partial content"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+def write_entry(url, body, metadata):
+    """Store a page and its validators in the cache"""
+    body_path, meta_path = cache_paths(url)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        if body is not None:
+            write_atomic(body_path, body)
+        write_atomic(meta_path, json.dumps(metadata, indent=2))
+    except OSError as e:
+        print(f"Warning: could not write docs cache for {url}: {e}")
+
+def fetch_cached(url):
+    """
+    Fetch a docs page through the cache.
+    Repeat reads in the same process come from memory, pages already revalidated
+    during the current run come from disk, and everything else is revalidated
+    with a conditional GET (If-None-Match / If-Modified-Since).
+    Returns the page text, or None if it could not be fetched.
+    """
+    if url in _memory_cache:
+        print(f"Using in-memory copy of {url}")
+        return _memory_cache[url]
+
+    body, metadata = read_entry(url)
+
+    if is_offline():
+        if body is None:
+            print(f"Offline mode: {url} is not in the docs cache")
+            return None
+        print(f"Offline mode: using cached copy of {url} from {metadata.get('fetched_at')}")
+        _memory_cache[url] = body
+        return body
+
+    run_id = current_run_id()
+    if body is not None and run_id and metadata.get("validated_run_id") == run_id:
+        print(f"Using cached copy of {url} (already revalidated in this run)")
+        _memory_cache[url] = body
+        return body
+
+    headers = {}
+    if body is not None:
+        if metadata.get("etag"):
+            headers["If-None-Match"] = metadata["etag"]
+        if metadata.get("last_modified"):
+            headers["If-Modified-Since"] = metadata["last_modified"]
+
+    try:
+        response = _session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    except requests.RequestException as e:
+        if body is not None:
+            print(f"Error fetching markdown ({e}), falling back to cached copy from {metadata.get('fetched_at')}")
+            _memory_cache[url] = body
+            return body
+        print(f"Error fetching markdown: {e}")
+        return None
+
+    if response.status_code == 304 and body is not None:
+        print("Docs page unchanged since last fetch (304), using cached copy")
+        metadata["validated_run_id"] = run_id
+        write_entry(url, None, metadata)
+    elif response.status_code == 200:
+        body = response.text
+        write_entry(url, body, {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": datetime.now().isoformat(),
+            "validated_run_id": run_id
+        })
+    elif response.status_code >= 500 and body is not None:
+        print(f"Error fetching markdown: {response.status_code}, falling back to cached copy from {metadata.get('fetched_at')}")
+    else:
+        print(f"Error fetching markdown: {response.status_code}")
+        return None
+
+    _memory_cache[url] = body
+    return body
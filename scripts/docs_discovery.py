@@ -0,0 +1,172 @@
+import os
+import re
+import json
+from concurrent.futures import ThreadPoolExecutor
+from docs_cache import fetch_cached
+from docs_parser import parse_markdown
+from run_trace import span
+from helper_functions import SDK_TYPES
+
+# Code block filename and language of each SDK on the docs pages (```typescript filename="avail-js" name="cmd1")
+SDK_BLOCKS = {
+    "js": ("avail-js", "typescript"),
+    "rust": ("avail-rust", "rust"),
+    "go": ("avail-go", "go")
+}
+# Docs pages fetched at the same time, each fetch mostly waits for the docs host
+FETCH_WORKERS = int(os.environ.get("NIGHTLY_DISCOVERY_WORKERS", "8"))
+
+def page_url(settings, page):
+    return f"{settings['docs_base']}/{page}/page.mdx"
+
+def page_slug(settings, page):
+    """
+    Id of a page's snippets: its path below the discover directory holding it,
+    e.g. "chain_account" for "api-reference/avail-node-api/chain/account", so
+    pages with the same name in different sections never share an id
+    """
+    roots = [root for root in settings.get("discover", []) if page.startswith(f"{root}/")]
+    relative = page[len(max(roots, key=len)) + 1:] if roots else page
+    return re.sub(r"\W+", "_", relative)
+
+def list_pages(settings):
+    """
+    Return the docs pages (paths below docs_base, e.g. "api-reference/avail-node-api/balances-transfer-keep-alive")
+    below the discover directories of the manifest, from a listing of the docs repository.
+    """
+    listing = fetch_cached(settings["docs_tree"])
+    if listing is None:
+        print("Could not list the docs pages, no snippets discovered")
+        return []
+    try:
+        tree = json.loads(listing)["tree"]
+    except (ValueError, KeyError) as e:
+        print(f"Unexpected docs listing from {settings['docs_tree']}: {e}")
+        return []
+
+    prefix = f"{settings['docs_root']}/"
+    pages = []
+    for entry in tree:
+        path = entry.get("path", "")
+        if entry.get("type") != "blob" or not path.startswith(prefix) or not path.endswith("/page.mdx"):
+            continue
+        page = path[len(prefix):-len("/page.mdx")]
+        if any(page == root or page.startswith(f"{root}/") for root in settings.get("discover", [])):
+            pages.append(page)
+    return sorted(pages)
+
+def sdk_of(block):
+    for sdk_type, (filename, language) in SDK_BLOCKS.items():
+        if block.filename == filename and block.language == language and block.name:
+            return sdk_type
+    return None
+
+def is_run_command(block):
+    return block.language == "bash" and block.filename == "terminal" and block.name
+
+def snippet_groups(document):
+    """
+    Pair each named SDK code block of a page with the terminal command that
+    follows it, before the next SDK code block. Pairs are grouped in document
+    order into one snippet per set of SDK tabs, a new snippet starts when an
+    SDK comes up again. Code blocks without a run command are not testable.
+    """
+    groups = []
+    current = {}
+    pending = None  # (sdk_type, block) still waiting for its run command
+    for block in document.blocks:
+        sdk_type = sdk_of(block)
+        if sdk_type:
+            if sdk_type in current:
+                groups.append(current)
+                current = {}
+            pending = (sdk_type, block)
+        elif pending and is_run_command(block):
+            sdk_type, code_block = pending
+            current[sdk_type] = {"content": code_block.name, "run": block.name}
+            pending = None
+    if current:
+        groups.append(current)
+    return groups
+
+def fetch_document(url):
+    markdown = fetch_cached(url)
+    return parse_markdown(markdown) if markdown is not None else None
+
+def discover_snippets(settings, known):
+    """
+    Find the testable snippets of the docs pages below the discover directories
+    of the manifest settings that the known (manifest) snippets do not cover.
+    Pages are fetched concurrently through the docs cache and parsed once.
+    Discovered snippets have the manifest format, without a success string:
+    a clean exit passes them. Only those listed in the manifest's
+    run_discovered are runnable, the others are reported but never executed,
+    as they may submit transactions with the nightly account.
+    """
+    # (url, sdk, content block) of every snippet already checked
+    covered = {(snippet["url"], sdk_type, snippet[sdk_type]["content"])
+               for snippet in known for sdk_type in SDK_TYPES if sdk_type in snippet}
+    known_ids = {snippet["id"] for snippet in known}
+    run_ids = set(settings.get("run_discovered", []))
+    # Ids of the snippets discovered so far, no two discovered snippets may share a results key or lane source
+    taken_ids = set(known_ids)
+
+    with span("discover snippets", "fetch") as discover_span:
+        pages = list_pages(settings)
+        urls = [page_url(settings, page) for page in pages]
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+            documents = list(executor.map(fetch_document, urls))
+
+        discovered = []
+        for page, url, document in zip(pages, urls, documents):
+            if document is None:
+                continue
+            groups = snippet_groups(document)
+            slug = page_slug(settings, page)
+            for position, group in enumerate(groups, start=1):
+                if any((url, sdk_type, entry["content"]) in covered for sdk_type, entry in group.items()):
+                    continue
+                # Numbered by position on the page, so ids stay the same when other groups get listed
+                snippet_id = slug if len(groups) == 1 else f"{slug}_{position}"
+                if snippet_id in known_ids:
+                    snippet_id = f"{snippet_id}_discovered"
+                # Pages are visited in sorted order, so the suffix is stable from run to run
+                base_id = snippet_id
+                suffix = 2
+                while snippet_id in taken_ids:
+                    snippet_id = f"{base_id}_{suffix}"
+                    suffix += 1
+                taken_ids.add(snippet_id)
+                title = slug.replace("_", " ").title() + (f" #{position}" if len(groups) > 1 else "")
+                snippet = {
+                    "id": snippet_id, "name": f"{title} (discovered)", "url": url, "page": page,
+                    "discovered": True, "runnable": snippet_id in run_ids
+                }
+                for sdk_type, entry in group.items():
+                    snippet[sdk_type] = {**entry, "success": None}
+                discovered.append(snippet)
+        discover_span["pages"] = len(pages)
+        discover_span["snippets"] = len(discovered)
+
+    runnable = sum(snippet["runnable"] for snippet in discovered)
+    print(f"Discovered {len(discovered)} unlisted snippets on {len(pages)} docs pages, {runnable} of them listed in run_discovered")
+    return discovered
+
+def save_discovered(snippets, path):
+    """Write discovered snippets for engine processes started with --discovered, so they do not scan the docs again"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snippets, f, indent=2)
+
+def load_discovered(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def manifest_entry(snippet):
+    """TOML manifest entry for a discovered snippet, to list it with a success string"""
+    lines = ["[[snippets]]", f'id = "{snippet["id"]}"', f'name = "{snippet["name"].removesuffix(" (discovered)")}"',
+             f'page = "{snippet["page"]}"', 'success = ""']
+    for sdk_type in SDK_TYPES:
+        if sdk_type in snippet:
+            lines.append(f'{sdk_type} = {{ content = "{snippet[sdk_type]["content"]}", run = "{snippet[sdk_type]["run"]}" }}')
+    return "\n".join(lines)
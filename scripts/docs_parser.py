@@ -0,0 +1,135 @@
+import re
+import sys
+
+# A fenced code block: opening fence with its info string, then the body up to the closing fence.
+# The closing fence must be alone on its line, ``` inside the code (e.g. in a string) does not end the block.
+FENCED_BLOCK_PATTERN = re.compile(r'^[ \t]*```([^`\n]*)\n(.*?)^[ \t]*```[ \t]*$', re.MULTILINE | re.DOTALL)
+# key="value" attributes of an info string, e.g. filename="avail-js" name="cmd1"
+ATTRIBUTE_PATTERN = re.compile(r'([\w-]+)="([^"]*)"')
+
+# Parsed documents, keyed by their markdown text
+_parsed_documents = {}
+
+class CodeBlock:
+    """A single fenced code block of a docs page"""
+
+    def __init__(self, index, language, attributes, flags, content):
+        self.index = index            # Position of the block in the document
+        self.language = language      # e.g. "typescript", "rust", "go", "bash"
+        self.attributes = attributes  # e.g. {"filename": "avail-js", "name": "cmd1"}
+        self.flags = flags            # Bare words of the info string, e.g. {"showLineNumbers"}
+        self.content = content
+
+    @property
+    def name(self):
+        return self.attributes.get("name")
+
+    @property
+    def filename(self):
+        return self.attributes.get("filename")
+
+    def __repr__(self):
+        return f"CodeBlock(index={self.index}, language={self.language!r}, attributes={self.attributes!r})"
+
+def parse_info_string(info):
+    """Split a fence info string into (language, attributes, flags)"""
+    attributes = dict(ATTRIBUTE_PATTERN.findall(info))
+    words = ATTRIBUTE_PATTERN.sub(" ", info).split()
+    language = words[0] if words else ""
+    return language, attributes, set(words[1:])
+
+class MarkdownDocument:
+    """
+    All fenced code blocks of a docs page, tokenized in a single pass.
+    Blocks are kept in document order and indexed by their name= attribute,
+    so looking up a snippet or terminal command does not rescan the page.
+    """
+
+    def __init__(self, markdown):
+        self.blocks = []
+        self.blocks_by_name = {}
+        for match in FENCED_BLOCK_PATTERN.finditer(markdown):
+            language, attributes, flags = parse_info_string(match.group(1))
+            block = CodeBlock(len(self.blocks), language, attributes, flags, match.group(2).strip())
+            self.blocks.append(block)
+            if block.name:
+                self.blocks_by_name.setdefault(block.name, []).append(block)
+
+    def find(self, name, language=None, filename=None):
+        """Return the first block with the given name (and language/filename if given), or None"""
+        for block in self.blocks_by_name.get(name, []):
+            if language is not None and block.language != language:
+                continue
+            if filename is not None and block.filename != filename:
+                continue
+            return block
+        return None
+
+    def content(self, name, language=None, filename=None):
+        """Return the content of a named block, or None if it is not in the document"""
+        block = self.find(name, language, filename)
+        return block.content if block else None
+
+    def command(self, name):
+        """Return a named terminal command (```bash filename="terminal" name="...")"""
+        return self.content(name, language="bash", filename="terminal")
+
+def parse_markdown(markdown):
+    """Parse a docs page, reusing the parsed document if this text was parsed before"""
+    document = _parsed_documents.get(markdown)
+    if document is None:
+        document = MarkdownDocument(markdown)
+        _parsed_documents[markdown] = document
+    return document
+
+# A page exercising the cases the parser must get right, checked by `python docs_parser.py check`
+SELF_CHECK_PAGE = """
+```typescript filename="avail-js" name="cmd1" showLineNumbers
+const fence = "```"
+console.log(`done ${fence}`)
+```
+
+```bash filename="terminal" name="cmd2"
+ts-node your-file-name.ts
+```
+
+  ```rust filename="avail-rust" name="cmd3"
+  fn main() {}
+  ```
+
+```bash filename="terminal" name="cmd4"
+cargo run
+```
+"""
+
+def self_check():
+    """Parse SELF_CHECK_PAGE and return the list of failed expectations"""
+    document = MarkdownDocument(SELF_CHECK_PAGE)
+    expectations = [
+        ("block count", len(document.blocks), 4),
+        ("``` inside code", document.content("cmd1", "typescript", "avail-js"),
+         'const fence = "```"\nconsole.log(`done ${fence}`)'),
+        ("command after it", document.command("cmd2"), "ts-node your-file-name.ts"),
+        ("indented fences", document.content("cmd3", "rust", "avail-rust"), "fn main() {}"),
+        ("last command", document.command("cmd4"), "cargo run"),
+        ("flags", document.find("cmd1").flags, {"showLineNumbers"}),
+    ]
+    return [
+        f"{name}: expected {expected!r}, got {actual!r}"
+        for name, actual, expected in expectations
+        if actual != expected
+    ]
+
+def main():
+    if sys.argv[1:] != ["check"]:
+        print("Usage: docs_parser.py check")
+        sys.exit(1)
+    failures = self_check()
+    for failure in failures:
+        print(f"FAILED {failure}")
+    if failures:
+        sys.exit(1)
+    print("Docs parser self-check passed")
+
+if __name__ == "__main__":
+    main()
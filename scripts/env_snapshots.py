@@ -0,0 +1,113 @@
+import os
+import shutil
+import hashlib
+import subprocess
+from run_trace import span
+
+# Directory holding one snapshot per SDK environment recipe
+SNAPSHOT_DIR = os.environ.get("NIGHTLY_SNAPSHOT_DIR", "/root/desktop/.cache/env-snapshots")
+# Number of snapshots kept per SDK (older recipes are pruned)
+SNAPSHOTS_TO_KEEP = 2
+
+def snapshots_disabled():
+    """Snapshots are bypassed when main.py runs with --fresh-env"""
+    return os.environ.get("NIGHTLY_FRESH_ENV") == "1"
+
+def recipe_key(parts):
+    """
+    Hash everything that defines an environment: the extracted setup commands,
+    config file contents and the setup script itself. Missing parts are hashed
+    as such, so a block disappearing from the docs also changes the key.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if part is None:
+            digest.update(b"\x00<missing>")
+        else:
+            digest.update(b"\x00" + part.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+def snapshot_path(env_name, key):
+    return os.path.join(SNAPSHOT_DIR, env_name, key)
+
+def clone_tree(source, destination):
+    """
+    Clone a directory tree, sharing file extents through reflinks where the
+    filesystem supports them (btrfs, xfs) and falling back to a full copy.
+    Hardlinks are not used: the snippet scripts rewrite files in place, which
+    would silently modify the snapshot too.
+    """
+    result = subprocess.run(
+        ["cp", "-a", "--reflink=auto", source, destination],
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        print(f"cp --reflink=auto failed ({result.stderr.strip()}), falling back to a plain copy")
+        if os.path.exists(destination):
+            shutil.rmtree(destination)
+        shutil.copytree(source, destination, symlinks=True)
+
+def restore_snapshot(env_name, key, target_dir):
+    """Restore target_dir from the snapshot for this recipe. Returns True on success."""
+    if snapshots_disabled():
+        print("Fresh environment requested, not using snapshots")
+        return False
+
+    snapshot = snapshot_path(env_name, key)
+    if not os.path.isdir(snapshot):
+        print(f"No snapshot of {env_name} for recipe {key}, building from scratch")
+        return False
+
+    print(f"Restoring {env_name} from snapshot {snapshot}")
+    try:
+        with span("restore snapshot", "setup", env=env_name, key=key):
+            if os.path.exists(target_dir):
+                shutil.rmtree(target_dir)
+            clone_tree(snapshot, target_dir)
+        # Mark the snapshot as recently used for pruning
+        os.utime(snapshot)
+        print(f"Successfully restored {target_dir} from snapshot")
+        return True
+    except Exception as e:
+        print(f"Error restoring snapshot, building from scratch: {e}")
+        shutil.rmtree(target_dir, ignore_errors=True)
+        return False
+
+def save_snapshot(env_name, key, target_dir):
+    """Save a freshly built target_dir as the snapshot for this recipe"""
+    if snapshots_disabled():
+        return False
+
+    snapshot = snapshot_path(env_name, key)
+    tmp_snapshot = f"{snapshot}.tmp-{os.getpid()}"
+    print(f"Saving {env_name} snapshot for recipe {key}")
+    try:
+        os.makedirs(os.path.dirname(snapshot), exist_ok=True)
+        with span("save snapshot", "setup", env=env_name, key=key):
+            clone_tree(target_dir, tmp_snapshot)
+        if os.path.exists(snapshot):
+            shutil.rmtree(snapshot)
+        os.rename(tmp_snapshot, snapshot)
+        os.utime(snapshot)
+        print(f"Saved snapshot to {snapshot}")
+    except Exception as e:
+        print(f"Error saving snapshot: {e}")
+        shutil.rmtree(tmp_snapshot, ignore_errors=True)
+        return False
+
+    prune_snapshots(env_name)
+    return True
+
+def prune_snapshots(env_name, keep=SNAPSHOTS_TO_KEEP):
+    """Remove all but the most recently used snapshots of an environment"""
+    env_dir = os.path.join(SNAPSHOT_DIR, env_name)
+    snapshots = [
+        os.path.join(env_dir, name)
+        for name in os.listdir(env_dir)
+        if ".tmp-" not in name
+    ]
+    snapshots.sort(key=os.path.getmtime, reverse=True)
+    for old_snapshot in snapshots[keep:]:
+        print(f"Pruning old snapshot {old_snapshot}")
+        shutil.rmtree(old_snapshot, ignore_errors=True)
@@ -0,0 +1,94 @@
+import os
+import hashlib
+import subprocess
+from datetime import date, datetime
+from run_history import last_result
+
+# Set by main.py --incremental: snippets whose fingerprint is unchanged since they last passed are not rerun
+INCREMENTAL_ENV = "NIGHTLY_INCREMENTAL"
+# Every snippet is rerun at least once in this many nights, even when nothing changed
+ROTATION_NIGHTS = int(os.environ.get("NIGHTLY_ROTATION_NIGHTS", "7"))
+
+# Lockfile of each SDK environment, holding the SDK version (and every other dependency) it resolved to
+LOCKFILES = {
+    "js": "pnpm-lock.yaml",
+    "rust": "Cargo.lock",
+    "go": "go.sum"
+}
+# Command printing the toolchain version of each SDK
+TOOLCHAIN_COMMANDS = {
+    "js": ["node", "--version"],
+    "rust": ["rustc", "--version"],
+    "go": ["go", "version"]
+}
+
+# Toolchain versions already asked for by this process
+_toolchain_versions = {}
+
+def is_incremental():
+    return os.environ.get(INCREMENTAL_ENV) == "1"
+
+def toolchain_version(sdk_type):
+    if sdk_type not in _toolchain_versions:
+        try:
+            result = subprocess.run(TOOLCHAIN_COMMANDS[sdk_type], capture_output=True, text=True, timeout=30)
+            _toolchain_versions[sdk_type] = result.stdout.strip() or None
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"Could not read the {sdk_type} toolchain version: {e}")
+            _toolchain_versions[sdk_type] = None
+    return _toolchain_versions[sdk_type]
+
+def lockfile_hash(sdk_type, target_dir):
+    try:
+        with open(os.path.join(target_dir, LOCKFILES[sdk_type]), "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+def snippet_fingerprint(sdk_type, target_dir, code, run_cmd):
+    """
+    Hash of everything a snippet outcome depends on apart from the chain:
+    the code from the docs, its run command, the dependency versions resolved
+    in the lockfile of the SDK environment and the toolchain version.
+    """
+    digest = hashlib.sha256()
+    for part in (code, run_cmd, lockfile_hash(sdk_type, target_dir), toolchain_version(sdk_type)):
+        digest.update(f"{part}\0".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+def run_night():
+    """Day of the run, from the run id main.py shares (e.g. 20250101T000000)"""
+    run_id = os.environ.get("NIGHTLY_RUN_ID", "")
+    try:
+        return datetime.strptime(run_id[:8], "%Y%m%d").date()
+    except ValueError:
+        return date.today()
+
+def in_rotation(key):
+    """True on the one night out of ROTATION_NIGHTS on which this key is rerun regardless"""
+    slot = int(hashlib.sha256(key.encode("utf-8")).hexdigest(), 16) % ROTATION_NIGHTS
+    return slot == run_night().toordinal() % ROTATION_NIGHTS
+
+def carried_over_result(key, fingerprint):
+    """
+    In incremental mode, return the run history row of the last result of a
+    key if it can be carried over instead of rerunning the snippet, else None.
+    A snippet is rerun when its fingerprint changed, it failed (or was never
+    checked) last time, or it is in tonight's rotating sample.
+    """
+    if not is_incremental():
+        return None
+    previous = last_result(key)
+    if previous is None:
+        print(f"{key} has no earlier result, running it")
+        return None
+    if not previous["status"]:
+        print(f"{key} failed in run {previous['run_id']}, running it again")
+        return None
+    if previous["fingerprint"] != fingerprint:
+        print(f"{key} changed since run {previous['run_id']} (fingerprint {previous['fingerprint']} -> {fingerprint}), running it")
+        return None
+    if in_rotation(key):
+        print(f"{key} is unchanged but in tonight's rotating sample, running it")
+        return None
+    return previous
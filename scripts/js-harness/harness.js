@@ -0,0 +1,370 @@
+#!/usr/bin/env node
+// Runs every prepared TypeScript snippet of the avail-js lane from a single Node harness.
+//
+// Run from the avail-js directory. For each snippets/<id>.ts (with its
+// snippets/<id>.json metadata written by the prepare stage) the harness
+// type-checks and transpiles the snippet, runs it in its own runner process, captures its
+// output (with the time of each write since the snippet started, for the
+// phase latencies) and writes the outcome to snippets/.harness/<id>.json.
+// A snippet is stopped once it has been quiet for its stall_timeout_ms, or
+// shortly after it printed its success string or a failure marker.
+// Runners are forked from this script ahead of time and load avail-js-sdk and
+// the other project dependencies before they get a snippet, so loading them
+// overlaps with the previous snippet instead of adding to every snippet.
+const fs = require('fs');
+const path = require('path');
+const Module = require('module');
+const { fork } = require('child_process');
+
+const SNIPPET_TIMEOUT_MS = Number(process.env.HARNESS_SNIPPET_TIMEOUT_MS || 45000);
+// Written next to the snippet outcomes, a dotfile so it never clashes with a snippet id
+const COMPILE_TIME_FILE = '.compile-time.json';
+// Milliseconds between SIGTERM and SIGKILL when stopping a runner
+const TERMINATE_TIMEOUT_MS = 5000;
+
+const targetDir = process.cwd();
+const snippetsDir = path.join(targetDir, 'snippets');
+const outputDir = path.join(snippetsDir, '.harness');
+const targetRequire = Module.createRequire(path.join(targetDir, 'package.json'));
+
+// Runners that have been forked and not closed yet
+const runners = new Set();
+
+function log(message) {
+  process.stdout.write(`[harness] ${message}\n`);
+}
+
+function loadTypeScript() {
+  // Prefer the project's typescript, then a global one (next to the global ts-node)
+  const globalModules = path.join(path.dirname(process.execPath), '..', 'lib', 'node_modules');
+  const candidates = [
+    () => targetRequire('typescript'),
+    () => require(path.join(globalModules, 'typescript')),
+    () => require(path.join(globalModules, 'ts-node', 'node_modules', 'typescript')),
+  ];
+  for (const candidate of candidates) {
+    try {
+      return candidate();
+    } catch (e) {
+      // Try the next location
+    }
+  }
+  throw new Error('Could not find the typescript package in the project or the global node_modules');
+}
+
+function compilerOptions(ts) {
+  // Use the project's tsconfig.json, but emit CommonJS so snippets can be loaded as modules
+  let options = {};
+  const configPath = path.join(targetDir, 'tsconfig.json');
+  if (fs.existsSync(configPath)) {
+    const { config } = ts.readConfigFile(configPath, ts.sys.readFile);
+    options = ts.convertCompilerOptionsFromJson((config && config.compilerOptions) || {}, targetDir).options;
+  }
+  return { ...options, module: ts.ModuleKind.CommonJS, noEmit: false, declaration: false, sourceMap: false };
+}
+
+function typeCheck(ts, options, ids) {
+  // One program over all snippets, so the SDK's declarations are only checked and loaded once.
+  // Like ts-node, only diagnostics of a snippet's own file fail it.
+  const files = ids.map((id) => path.join(snippetsDir, `${id}.ts`));
+  const checkOptions = { ...options, noEmit: true };
+  if (ts.ModuleDetectionKind && checkOptions.moduleDetection === undefined) {
+    // Each snippet runs on its own, so top-level names of different snippets must not clash
+    checkOptions.moduleDetection = ts.ModuleDetectionKind.Force;
+  }
+  const program = ts.createProgram(files, checkOptions);
+  const errors = {};
+  for (const diagnostic of ts.getPreEmitDiagnostics(program)) {
+    if (diagnostic.category !== ts.DiagnosticCategory.Error) continue;
+    const message = ts.flattenDiagnosticMessageText(diagnostic.messageText, '\n');
+    const index = diagnostic.file ? files.indexOf(path.resolve(diagnostic.file.fileName)) : -1;
+    if (index === -1) {
+      log(`type-check: ${message}`);
+      continue;
+    }
+    const { line, character } = ts.getLineAndCharacterOfPosition(diagnostic.file, diagnostic.start);
+    (errors[ids[index]] = errors[ids[index]] || []).push(`${ids[index]}.ts(${line + 1},${character + 1}): ${message}`);
+  }
+  return errors;
+}
+
+function transpile(ts, options, id, source) {
+  const output = ts.transpileModule(source, {
+    compilerOptions: options,
+    fileName: `${id}.ts`,
+    reportDiagnostics: true,
+  });
+  const errors = (output.diagnostics || []).filter((d) => d.category === ts.DiagnosticCategory.Error);
+  if (errors.length > 0) {
+    throw new Error(errors.map((d) => ts.flattenDiagnosticMessageText(d.messageText, '\n')).join('\n'));
+  }
+  return output.outputText;
+}
+
+// Runner side: preload the dependencies, then run the one snippet the harness sends
+function runner() {
+  let dependencies = {};
+  try {
+    dependencies = JSON.parse(fs.readFileSync(path.join(targetDir, 'package.json'), 'utf8')).dependencies || {};
+  } catch (e) {
+    // Nothing to preload, the snippet loads what it needs itself
+  }
+  for (const name of Object.keys(dependencies)) {
+    try {
+      targetRequire(name);
+    } catch (e) {
+      // Not loadable on its own (e.g. a types-only package), the snippet decides
+    }
+  }
+
+  process.once('message', ({ id, code }) => {
+    // The channel to the harness must not keep a finished snippet alive:
+    // like a standalone ts-node process, the runner exits once the snippet has settled
+    process.channel.unref();
+    const filename = path.join(snippetsDir, `${id}.ts`);
+    const snippetModule = new Module(filename, module);
+    snippetModule.filename = filename;
+    snippetModule.paths = Module._nodeModulePaths(snippetsDir);
+    // Errors, unhandled rejections and process.exit end this process, as they would end ts-node
+    snippetModule._compile(code, filename);
+  });
+  process.send({ ready: true });
+}
+
+function signalGroup(child, signal) {
+  try {
+    process.kill(-child.pid, signal);
+  } catch (e) {
+    // The group is gone already
+  }
+}
+
+function forkRunner() {
+  const child = fork(__filename, ['--runner'], {
+    cwd: targetDir,
+    stdio: ['ignore', 'pipe', 'pipe', 'ipc'],
+    // Leads its own process group, so stopping a snippet also stops whatever it spawned
+    detached: true,
+  });
+  const runner = { child, run: null, exit: null };
+  runners.add(runner);
+  runner.ready = new Promise((resolve) => {
+    child.once('message', () => resolve(true));
+    child.once('exit', () => resolve(false));
+  });
+  child.once('exit', (code, signal) => {
+    runner.exit = { code, signal };
+    // Also stops descendants left behind by a snippet that exited on its own
+    signalGroup(child, 'SIGKILL');
+  });
+  // Once the runner has exited and every process holding its output pipes is gone
+  runner.closed = new Promise((resolve) => child.once('close', () => {
+    runners.delete(runner);
+    resolve();
+  }));
+  for (const stream of ['stdout', 'stderr']) {
+    child[stream].setEncoding('utf8');
+    child[stream].on('data', (text) => {
+      if (runner.run) {
+        runner.run.capture(stream, text);
+      } else {
+        // Output of the runner while it loads the dependencies
+        process[stream].write(text);
+      }
+    });
+  }
+  return runner;
+}
+
+function stopRunner(runner) {
+  if (runner.exit) return;
+  signalGroup(runner.child, 'SIGTERM');
+  setTimeout(() => signalGroup(runner.child, 'SIGKILL'), TERMINATE_TIMEOUT_MS).unref();
+}
+
+function matchLine(line, metadata) {
+  // Like match_line in command_runner.py: "success" or "failure" if the line contains a marker
+  if (metadata.success_string && line.includes(metadata.success_string)) return 'success';
+  if ((metadata.failure_markers || []).some((marker) => line.includes(marker))) return 'failure';
+  return null;
+}
+
+async function runSnippet(runner, id, code, metadata) {
+  const graceMs = metadata.grace_period_ms ?? 2000;
+  const stallMs = metadata.stall_timeout_ms ?? null;
+  let timer = null;
+  // Like the stall watchdog of stream_command: restarted by every output write until a marker matched
+  let stallTimer = null;
+  const run = {
+    stdout: [],
+    stderr: [],
+    // [milliseconds since start, text] of every write, on either stream
+    timeline: [],
+    // Output of each stream after its last complete line, a marker may be split across writes
+    pending: { stdout: '', stderr: '' },
+    startedAt: Date.now(),
+    timedOut: false,
+    stalled: false,
+    matched: null,
+    successSeen: false,
+    stoppedEarly: false,
+    capture(stream, text) {
+      run.watchStall();
+      run[stream].push(text);
+      run.timeline.push([Date.now() - run.startedAt, text]);
+      const lines = (run.pending[stream] + text).split('\n');
+      run.pending[stream] = lines.pop();
+      for (const line of lines) run.observe(line);
+    },
+    watchStall() {
+      clearTimeout(stallTimer);
+      if (stallMs === null || run.matched || runner.exit) return;
+      stallTimer = setTimeout(() => {
+        run.stderr.push(`No output for ${stallMs} ms, stopping the snippet\n`);
+        log(`${id}: no output for ${stallMs} ms, stopping it`);
+        run.timedOut = true;
+        run.stalled = true;
+        stopRunner(runner);
+      }, stallMs);
+    },
+    observe(line) {
+      if (metadata.success_string && line.includes(metadata.success_string)) run.successSeen = true;
+      if (run.matched) return;
+      run.matched = matchLine(line, metadata);
+      if (!run.matched) return;
+      // The snippet gets a grace period to exit on its own, instead of waiting for
+      // snippets that keep their websocket open until the timeout
+      log(`${id}: matched ${run.matched} marker: ${line.trim()}`);
+      clearTimeout(stallTimer);
+      clearTimeout(timer);
+      timer = setTimeout(() => {
+        run.stoppedEarly = !runner.exit;
+        stopRunner(runner);
+      }, graceMs);
+    },
+  };
+
+  if (!(await runner.ready)) {
+    await runner.closed;
+    return {
+      exit_code: 1,
+      timed_out: false,
+      stalled: false,
+      stdout: '',
+      stderr: `Runner exited before the snippet started (exit code ${runner.exit.code}, signal ${runner.exit.signal})\n`,
+      timeline: [],
+      duration_ms: 0,
+      matched: null,
+      stopped_early: false,
+      success_seen: false,
+    };
+  }
+
+  runner.run = run;
+  run.startedAt = Date.now();
+  // The harness's own event loop is never blocked by the snippet, so the timeout always fires
+  timer = setTimeout(() => {
+    run.stderr.push(`Snippet timed out after ${SNIPPET_TIMEOUT_MS} ms\n`);
+    run.timedOut = true;
+    stopRunner(runner);
+  }, SNIPPET_TIMEOUT_MS);
+  run.watchStall();
+  runner.child.send({ id, code });
+
+  // A snippet is only done once its runner is gone, so nothing of it outlives its outcome
+  await runner.closed;
+  clearTimeout(timer);
+  clearTimeout(stallTimer);
+  // Output without a final newline
+  for (const stream of ['stdout', 'stderr']) {
+    if (run.pending[stream]) run.observe(run.pending[stream]);
+  }
+  const { code: exitCode, signal } = runner.exit;
+  if (run.stoppedEarly) {
+    log(`${id}: stopped ${graceMs} ms after matching a ${run.matched} marker`);
+  } else if (signal && !run.timedOut) {
+    run.stderr.push(`Snippet was stopped by ${signal}\n`);
+  }
+  return {
+    exit_code: run.timedOut || signal ? null : exitCode,
+    timed_out: run.timedOut,
+    stalled: run.stalled,
+    stdout: run.stdout.join(''),
+    stderr: run.stderr.join(''),
+    timeline: run.timeline,
+    duration_ms: Date.now() - run.startedAt,
+    matched: run.matched,
+    stopped_early: run.stoppedEarly,
+    success_seen: run.successSeen,
+  };
+}
+
+async function main() {
+  const ts = loadTypeScript();
+  const options = compilerOptions(ts);
+  fs.mkdirSync(outputDir, { recursive: true });
+
+  const ids = fs.readdirSync(snippetsDir)
+    .filter((name) => name.endsWith('.ts'))
+    .map((name) => name.slice(0, -3))
+    .sort();
+
+  // Type-check and transpile everything up front so compile errors are known before anything runs
+  const compileStartedAt = Date.now();
+  const typeErrors = typeCheck(ts, options, ids);
+  const compiled = {};
+  for (const id of ids) {
+    const resultPath = path.join(outputDir, `${id}.json`);
+    try {
+      if (typeErrors[id]) {
+        throw new Error(typeErrors[id].join('\n'));
+      }
+      const source = fs.readFileSync(path.join(snippetsDir, `${id}.ts`), 'utf8');
+      compiled[id] = transpile(ts, options, id, source);
+      fs.writeFileSync(path.join(outputDir, `${id}.js`), compiled[id]);
+    } catch (error) {
+      log(`${id}: compile error`);
+      fs.writeFileSync(resultPath, JSON.stringify({ snippet: id, compile_error: String(error.message || error) }, null, 2));
+    }
+  }
+  const compileMs = Date.now() - compileStartedAt;
+  log(`Type-checked and transpiled ${Object.keys(compiled).length}/${ids.length} snippets in ${compileMs} ms`);
+  // The compile time of the lane, without the time spent running the snippets
+  fs.writeFileSync(path.join(outputDir, COMPILE_TIME_FILE), JSON.stringify({ duration_ms: compileMs }));
+
+  // stream_command stops the harness's process group, the runners lead their own
+  for (const signal of ['SIGTERM', 'SIGINT']) {
+    process.on(signal, () => {
+      for (const runner of runners) signalGroup(runner.child, 'SIGKILL');
+      process.exit(1);
+    });
+  }
+
+  const runIds = Object.keys(compiled);
+  let next = runIds.length > 0 ? forkRunner() : null;
+  for (const [index, id] of runIds.entries()) {
+    const runner = next;
+    // The next runner loads the dependencies while this snippet runs
+    next = index + 1 < runIds.length ? forkRunner() : null;
+    const metadata = JSON.parse(fs.readFileSync(path.join(snippetsDir, `${id}.json`), 'utf8'));
+    log(`Running ${id}`);
+    const result = await runSnippet(runner, id, compiled[id], metadata);
+    result.snippet = id;
+    // A snippet stopped after printing its success string (e.g. an open websocket) still passed.
+    // Discovered snippets have no success string, a clean exit passes them.
+    const completed = result.exit_code === 0 || (result.stopped_early && result.matched === 'success');
+    result.success = completed && (metadata.success_string === null || result.success_seen);
+    fs.writeFileSync(path.join(outputDir, `${id}.json`), JSON.stringify(result, null, 2));
+    log(`${id}: ${result.success ? 'success' : 'failed'} (${result.duration_ms} ms)`);
+  }
+}
+
+if (process.argv[2] === '--runner') {
+  runner();
+} else {
+  main().then(() => process.exit(0), (error) => {
+    process.stderr.write(`[harness] ${error && error.stack ? error.stack : error}\n`);
+    for (const runner of runners) signalGroup(runner.child, 'SIGKILL');
+    process.exit(1);
+  });
+}
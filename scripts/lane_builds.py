@@ -0,0 +1,324 @@
+import os
+import sys
+import json
+import argparse
+import time
+import subprocess
+from run_trace import span
+from command_runner import (
+    stream_command,
+    COMPILE_STALL_TIMEOUT,
+    TERMINATE_TIMEOUT,
+    FAILURE_MARKERS,
+    MATCH_GRACE_PERIOD,
+    STALL_TIMEOUT,
+    PHASE_MARKERS,
+    PhaseTracker
+)
+from results_journal import append_build
+
+# Timeout for compiling all snippets of a lane at once
+LANE_BUILD_TIMEOUT = 900
+
+# Node harness that transpiles all TypeScript snippets and runs each in a prewarmed runner process
+JS_HARNESS_SCRIPT = os.path.join(os.path.dirname(os.path.realpath(__file__)), "js-harness", "harness.js")
+
+# Type-check and transpile time the harness records, its lane build also runs the snippets
+HARNESS_COMPILE_TIME_FILE = ".compile-time.json"
+# Seconds each harness snippet may run (the harness reads the same variable)
+HARNESS_SNIPPET_TIMEOUT = int(os.environ.get("HARNESS_SNIPPET_TIMEOUT_MS", "45000")) / 1000
+# Seconds the harness may spend type-checking and transpiling before the first snippet runs
+HARNESS_COMPILE_TIMEOUT = 300
+
+# Target directories of the SDK environments
+TARGET_DIRS = {
+    "js": "/root/desktop/avail-js",
+    "rust": "/root/desktop/avail-rust",
+    "go": "/root/desktop/avail-go"
+}
+
+# SDKs whose snippets are written out first and then compiled together in one build
+LANE_BUILD_SDKS = ["js", "rust", "go"]
+# SDKs whose lane build also runs the snippets (the JS harness)
+LANE_RUN_SDKS = ["js"]
+
+def has_lane_build(sdk_type):
+    return sdk_type in LANE_BUILD_SDKS
+
+def lane_runs_snippets(sdk_type):
+    return sdk_type in LANE_RUN_SDKS
+
+def lane_source_path(sdk_type, target_dir, snippet_id):
+    """Where the prepare stage writes the snippet source for the lane build"""
+    if sdk_type == "rust":
+        # Every file in src/bin/ becomes its own binary target of the crate
+        return os.path.join(target_dir, "src", "bin", f"{snippet_id}.rs")
+    if sdk_type == "go":
+        # Every package under cmd/ becomes its own binary of the module
+        return os.path.join(target_dir, "cmd", snippet_id, "main.go")
+    if sdk_type == "js":
+        # Picked up by the Node harness together with snippets/<id>.json
+        return os.path.join(target_dir, "snippets", f"{snippet_id}.ts")
+    raise ValueError(f"No lane build for SDK {sdk_type}")
+
+def lane_artifact_path(sdk_type, target_dir, snippet_id):
+    """
+    Where the lane build puts the result of building a snippet: the executable
+    for Rust and Go, the harness outcome of the already executed snippet for JS
+    """
+    if sdk_type == "rust":
+        return os.path.join(target_dir, "target", "debug", snippet_id)
+    if sdk_type == "go":
+        return os.path.join(target_dir, "bin", snippet_id)
+    if sdk_type == "js":
+        return os.path.join(target_dir, "snippets", ".harness", f"{snippet_id}.json")
+    raise ValueError(f"No lane build for SDK {sdk_type}")
+
+def remove_lane_source(sdk_type, target_dir, snippet_id):
+    """Leave a snippet out of the lane build, e.g. when its binary came from the binary cache"""
+    source = lane_source_path(sdk_type, target_dir, snippet_id)
+    try:
+        os.remove(source)
+        if sdk_type == "go":
+            # An empty cmd/<snippet> directory is not a package of ./cmd/...
+            os.rmdir(os.path.dirname(source))
+    except OSError:
+        pass
+
+def has_lane_sources(sdk_type, target_dir):
+    """True if the prepare stage left any snippet source for the lane build to compile"""
+    if sdk_type == "rust":
+        bin_dir = os.path.join(target_dir, "src", "bin")
+        return os.path.isdir(bin_dir) and any(name.endswith(".rs") for name in os.listdir(bin_dir))
+    if sdk_type == "go":
+        cmd_dir = os.path.join(target_dir, "cmd")
+        return os.path.isdir(cmd_dir) and any(
+            os.path.exists(os.path.join(cmd_dir, name, "main.go")) for name in os.listdir(cmd_dir)
+        )
+    if sdk_type == "js":
+        return count_js_sources(target_dir) > 0
+    return True
+
+def count_js_sources(target_dir):
+    """Number of snippets/<id>.ts the JS harness will run, none if no snippet was prepared"""
+    try:
+        return sum(name.endswith(".ts") for name in os.listdir(os.path.join(target_dir, "snippets")))
+    except FileNotFoundError:
+        return 0
+
+def lane_run_command(sdk_type, target_dir, snippet_id, run_cmd):
+    """
+    Turn the run command from the docs into a command running the prebuilt
+    binary, keeping the program arguments the docs pass to it.
+    """
+    return binary_run_command(sdk_type, lane_artifact_path(sdk_type, target_dir, snippet_id), run_cmd)
+
+def binary_run_command(sdk_type, binary, run_cmd):
+    """Turn a `cargo run` / `go run` command from the docs into one running binary with the same program arguments"""
+    args = run_cmd.split()
+    if sdk_type == "rust":
+        # `cargo run [cargo options] -- [program args]`
+        program_args = args[args.index("--") + 1:] if "--" in args else []
+        return " ".join([binary] + program_args)
+    if sdk_type == "go":
+        # `go run [build flags] main.go [program args]`, e.g. `go run main.go --config config.json`
+        program_args = []
+        for index, arg in enumerate(args[2:], start=2):
+            if arg.endswith(".go") or arg == ".":
+                program_args = [a for a in args[index + 1:] if not a.endswith(".go")]
+                break
+        return " ".join([binary] + program_args)
+    raise ValueError(f"No lane build for SDK {sdk_type}")
+
+def is_artifact_current(sdk_type, target_dir, snippet_id):
+    """True if the snippet artifact exists and was built from the current source"""
+    artifact = lane_artifact_path(sdk_type, target_dir, snippet_id)
+    source = lane_source_path(sdk_type, target_dir, snippet_id)
+    if not os.path.exists(artifact):
+        return False
+    return not os.path.exists(source) or os.path.getmtime(artifact) >= os.path.getmtime(source)
+
+def stopped_before_run(sdk_type, target_dir, snippet_id):
+    """
+    True if the JS harness compiled the snippet from its current source but
+    was stopped (lane build timeout or stall) before it ran it, so the
+    snippet has no outcome although it did not fail to compile
+    """
+    if not lane_runs_snippets(sdk_type):
+        return False
+    compiled = os.path.join(target_dir, "snippets", ".harness", f"{snippet_id}.js")
+    source = lane_source_path(sdk_type, target_dir, snippet_id)
+    if not os.path.exists(compiled):
+        return False
+    return not os.path.exists(source) or os.path.getmtime(compiled) >= os.path.getmtime(source)
+
+def write_snippet_metadata(sdk_type, target_dir, snippet_id, success_string, stall_timeout=None):
+    """
+    Record what the JS harness needs to judge a snippet next to its source:
+    the success string and failure markers it matches while the snippet runs,
+    how long the snippet may keep running after a match and how long it may
+    go without output (stall_timeout, default STALL_TIMEOUT) before it is stopped
+    """
+    if sdk_type != "js":
+        return
+    metadata_path = os.path.join(target_dir, "snippets", f"{snippet_id}.json")
+    with open(metadata_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "success_string": success_string,
+            "failure_markers": FAILURE_MARKERS[sdk_type],
+            "grace_period_ms": int(MATCH_GRACE_PERIOD * 1000),
+            "stall_timeout_ms": int((stall_timeout or STALL_TIMEOUT) * 1000)
+        }, f, indent=2)
+
+def harness_phases(sdk_type, timeline):
+    """Phase latencies of a harness snippet from its [milliseconds, text] output writes"""
+    tracker = PhaseTracker(PHASE_MARKERS[sdk_type])
+    pending = ""
+    elapsed_ms = 0
+    for elapsed_ms, text in timeline:
+        # A line is timed by the write that completes it
+        *lines, pending = (pending + text).split("\n")
+        for line in lines:
+            tracker.observe(line, elapsed_ms / 1000)
+    if pending:
+        tracker.observe(pending, elapsed_ms / 1000)
+    return tracker.phases
+
+def load_harness_result(sdk_type, target_dir, snippet_id):
+    """
+    Return the outcome of a snippet the JS harness already executed as a
+    CompletedProcess, like run_command does
+    """
+    with open(lane_artifact_path(sdk_type, target_dir, snippet_id), "r", encoding="utf-8") as f:
+        outcome = json.load(f)
+
+    if "compile_error" in outcome:
+        print(f"Compile error: {outcome['compile_error']}")
+        result = subprocess.CompletedProcess(["node", JS_HARNESS_SCRIPT], 1, "", outcome["compile_error"])
+        result.duration = 0
+        result.compile_error = True
+        result.timed_out = False
+        result.stalled = False
+        result.matched = None
+        result.stopped_early = False
+        result.success_seen = False
+        result.phases = {}
+        return result
+
+    print(f"Snippet ran in the JS harness in {outcome['duration_ms']} ms")
+    if outcome.get("stalled"):
+        print("Command execution stalled")
+    elif outcome["timed_out"]:
+        print("Command execution timed out")
+    elif outcome["stopped_early"]:
+        print(f"Command stopped after matching a {outcome['matched']} marker")
+    print("Command output:")
+    print(outcome["stdout"])
+    if outcome["stderr"]:
+        print("Error output:")
+        print(outcome["stderr"])
+    result = subprocess.CompletedProcess(["node", JS_HARNESS_SCRIPT], outcome["exit_code"], outcome["stdout"], outcome["stderr"])
+    result.duration = outcome["duration_ms"] / 1000
+    result.compile_error = False
+    result.timed_out = outcome["timed_out"]
+    result.stalled = outcome.get("stalled", False)
+    # Matched by the harness while the snippet ran, as stream_command does
+    result.matched = outcome["matched"]
+    result.stopped_early = outcome["stopped_early"]
+    result.success_seen = outcome["success_seen"]
+    result.phases = harness_phases(sdk_type, outcome.get("timeline", []))
+    return result
+
+def harness_compile_time(target_dir):
+    """Seconds the JS harness spent type-checking and transpiling, or None if it did not get that far"""
+    try:
+        with open(os.path.join(target_dir, "snippets", ".harness", HARNESS_COMPILE_TIME_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)["duration_ms"] / 1000
+    except (OSError, ValueError, KeyError):
+        return None
+
+def lane_build_command(sdk_type):
+    if sdk_type == "rust":
+        # --keep-going builds every binary that compiles even if others fail
+        return ["cargo", "build", "--bins", "--keep-going"]
+    if sdk_type == "go":
+        # Builds the cmd/ packages in parallel and still writes the binaries that compile
+        return ["go", "build", "-o", "bin/", "./cmd/..."]
+    if sdk_type == "js":
+        # Transpiles every snippet and then runs them one by one in runners with the SDK already loaded
+        return ["node", JS_HARNESS_SCRIPT]
+    raise ValueError(f"No lane build for SDK {sdk_type}")
+
+def build_lane(sdk_type, target_dir):
+    """Compile all prepared snippets of a lane in a single build. Returns True on success."""
+    if not has_lane_sources(sdk_type, target_dir):
+        if lane_runs_snippets(sdk_type):
+            # Every snippet was carried over, shared with another one or failed before it was prepared
+            print(f"\n=== Nothing to run for {sdk_type}, no snippet was prepared for the harness ===")
+        else:
+            print(f"\n=== Nothing to build for {sdk_type}, every snippet binary came from the binary cache ===")
+        return True
+    command = lane_build_command(sdk_type)
+    print(f"\n=== Building all {sdk_type} snippets: {' '.join(command)} ===")
+    timeout = LANE_BUILD_TIMEOUT
+    # A compile that stops making progress is stuck, however much of the timeout is left.
+    # The harness logs every snippet it starts and finishes, so it is never quiet for that long either.
+    stall_timeout = COMPILE_STALL_TIMEOUT
+    if sdk_type == "js":
+        # The harness also runs the snippets, one after another and each within its own timeout
+        snippet_count = count_js_sources(target_dir)
+        timeout = HARNESS_COMPILE_TIMEOUT + snippet_count * (HARNESS_SNIPPET_TIMEOUT + TERMINATE_TIMEOUT)
+        # Not left over from an earlier harness run in a restored environment
+        try:
+            os.remove(os.path.join(target_dir, "snippets", ".harness", HARNESS_COMPILE_TIME_FILE))
+        except FileNotFoundError:
+            pass
+    started = time.monotonic()
+    success = False
+    try:
+        with span("lane build", "compile", sdk=sdk_type, command=" ".join(command)) as build_span:
+            # Runs in its own process group, so a timeout also stops rustc / the compile workers
+            result = stream_command(command, target_dir, timeout, stall_timeout=stall_timeout, log_name=f"{sdk_type}-lane-build")
+            build_span["returncode"] = result.returncode
+
+        print("Lane build output:")
+        print(result.stdout)
+
+        if result.stderr:
+            print("Lane build stderr:")
+            print(result.stderr)
+
+        if result.stalled:
+            print(f"Lane build made no progress for {stall_timeout} seconds")
+        elif result.timed_out:
+            print(f"Lane build timed out after {timeout} seconds")
+        elif result.returncode != 0:
+            print(f"Lane build failed with return code {result.returncode}, snippets that did not compile will be reported as failed")
+        else:
+            print("Lane build completed successfully")
+            success = True
+
+    except Exception as e:
+        print(f"Error during lane build: {e}")
+
+    # Kept in the run history as the compile time of this lane's snippets
+    duration = round(time.monotonic() - started, 3)
+    if sdk_type == "js":
+        # The harness also runs the snippets, only its type-check and transpile time is compile time
+        duration = harness_compile_time(target_dir)
+    if duration is None:
+        print("The JS harness recorded no compile time, leaving it out of the run history")
+    else:
+        append_build(sdk_type, duration, success)
+    return success
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile all prepared snippets of an SDK lane at once")
+    parser.add_argument("--sdk", choices=LANE_BUILD_SDKS, required=True)
+    args = parser.parse_args()
+
+    success = build_lane(args.sdk, TARGET_DIRS[args.sdk])
+    sys.exit(0 if success else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import os
+import shutil
+
+# Lockfiles of the SDK environments, kept across runs (not pushed):
+# recipes/<env>/<key>/ holds the ones to reuse, runs/<run id>/<env>/ those of every run
+LOCKFILE_DIR = os.environ.get("NIGHTLY_LOCKFILE_DIR", "/root/desktop/.cache/lockfiles")
+# Number of runs whose lockfiles are archived
+LOCKFILE_RUNS_TO_KEEP = 30
+# Number of recipes per environment whose lockfiles are kept for reuse
+LOCKFILE_RECIPES_TO_KEEP = 2
+
+# Files recording the dependencies each environment resolved to. The manifest
+# is kept with the lockfile, a frozen install needs both.
+ENV_LOCKFILES = {
+    "avail-js": ["package.json", "pnpm-lock.yaml"],
+    "avail-rust": ["Cargo.lock"],
+    "avail-go": ["go.mod", "go.sum"]
+}
+
+def recipe_dir(env_name, key):
+    return os.path.join(LOCKFILE_DIR, "recipes", env_name, key)
+
+def copy_lockfiles(env_name, source_dir, destination_dir):
+    """Copy the lockfiles of an environment if all of them exist. Returns True if copied."""
+    names = ENV_LOCKFILES[env_name]
+    if not all(os.path.exists(os.path.join(source_dir, name)) for name in names):
+        return False
+    os.makedirs(destination_dir, exist_ok=True)
+    for name in names:
+        shutil.copyfile(os.path.join(source_dir, name), os.path.join(destination_dir, name))
+    return True
+
+def prune_lockfile_dirs(parent, keep, newest):
+    """Remove all but the `keep` newest directories of lockfiles in parent, ordered by newest(path)"""
+    try:
+        paths = [os.path.join(parent, name) for name in os.listdir(parent)]
+    except FileNotFoundError:
+        return
+    for old_dir in sorted(paths, key=newest, reverse=True)[keep:]:
+        print(f"Removing old lockfiles {old_dir}")
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+def restore_lockfiles(env_name, key, target_dir):
+    """
+    Copy the lockfiles resolved for the same declared dependencies (key) on an
+    earlier run into target_dir. Returns True if there were any.
+    """
+    if os.environ.get("NIGHTLY_FRESH_ENV") == "1":
+        print("Fresh environment requested, resolving dependencies again")
+        return False
+    source = recipe_dir(env_name, key)
+    try:
+        restored = copy_lockfiles(env_name, source, target_dir)
+    except OSError as e:
+        print(f"Error restoring lockfiles: {e}")
+        return False
+    if restored:
+        # Mark the lockfiles as recently used for pruning
+        os.utime(source)
+        print(f"Restored {', '.join(ENV_LOCKFILES[env_name])} of {env_name} for recipe {key}")
+    else:
+        print(f"No lockfiles of {env_name} for recipe {key}, resolving dependencies")
+    return restored
+
+def save_lockfiles(env_name, key, target_dir):
+    """Keep the lockfiles a fresh setup resolved, for the next runs with the same declared dependencies"""
+    destination = recipe_dir(env_name, key)
+    try:
+        if not copy_lockfiles(env_name, target_dir, destination):
+            print(f"{env_name} has no complete set of lockfiles to keep")
+            return False
+        os.utime(destination)
+    except OSError as e:
+        print(f"Error saving lockfiles: {e}")
+        return False
+    print(f"Saved lockfiles of {env_name} for recipe {key}")
+
+    # Recipes are ordered by when they were last used
+    prune_lockfile_dirs(os.path.dirname(destination), LOCKFILE_RECIPES_TO_KEEP, os.path.getmtime)
+    return True
+
+def archive_run_lockfiles(run_id, target_dirs):
+    """Archive the lockfiles of every environment of a run, before main.py removes the environments"""
+    runs_dir = os.path.join(LOCKFILE_DIR, "runs")
+    archived = []
+    for target_dir in target_dirs:
+        env_name = os.path.basename(target_dir)
+        try:
+            if copy_lockfiles(env_name, target_dir, os.path.join(runs_dir, run_id, env_name)):
+                archived.append(env_name)
+        except OSError as e:
+            print(f"Error archiving lockfiles of {env_name}: {e}")
+    # Run ids sort by the time the run started
+    prune_lockfile_dirs(runs_dir, LOCKFILE_RUNS_TO_KEEP, os.path.basename)
+    return archived
@@ -0,0 +1,187 @@
+import os
+import sys
+import json
+import fcntl
+import atexit
+import threading
+from datetime import datetime
+
+# Materialised results read by slack-bot.py and pushed to GitHub
+RESULTS_FILE = "/root/desktop/run-results.json"
+# Append-only log of every result recorded during the current run
+JOURNAL_FILE = os.environ.get("NIGHTLY_RESULTS_JOURNAL", "/root/desktop/run-results.journal.jsonl")
+# Number of appended records after which the journal is fsynced; the rest are fsynced at exit
+FSYNC_BATCH_SIZE = 16
+
+# Records appended by this process that are not fsynced yet
+_unsynced_records = 0
+# Lanes running in-process append from several threads, so the count is only updated under this lock
+_sync_lock = threading.Lock()
+
+# Last result record of each key, from the records this process appended and the journal lines indexed so far
+_latest_results = {}
+# Bytes at the start of the journal already indexed into _latest_results
+_indexed_bytes = 0
+# Lanes running in-process append and look up results from several threads
+_index_lock = threading.Lock()
+
+def append_record(record):
+    """
+    Append a record to the journal. Every record is one line written with a
+    single O_APPEND write under an exclusive lock, so concurrent lanes never
+    interleave or lose records. Nothing is rewritten, and result lookups go
+    through an in-process index instead of reading the journal back.
+    """
+    global _unsynced_records
+    record = {**record, "timestamp": datetime.now().isoformat()}
+    line = (json.dumps(record) + "\n").encode("utf-8")
+
+    fd = os.open(JOURNAL_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        os.write(fd, line)
+        with _sync_lock:
+            _unsynced_records += 1
+            sync_batch = _unsynced_records >= FSYNC_BATCH_SIZE
+            if sync_batch:
+                _unsynced_records = 0
+        if sync_batch:
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+    if "key" in record:
+        with _index_lock:
+            _latest_results[record["key"]] = record
+
+def append_result(key, value, details=None):
+    """Record a single snippet result, with optional details kept for the run history"""
+    record = {"key": key, "value": value}
+    if details:
+        record["details"] = details
+    append_record(record)
+
+def append_build(sdk_type, duration, success):
+    """Record a lane build, so run history can attribute compile time to the snippets of a lane"""
+    append_record({"build": sdk_type, "duration": duration, "success": success})
+
+@atexit.register
+def sync_journal():
+    """fsync the records this process appended since the last batch"""
+    global _unsynced_records
+    with _sync_lock:
+        if _unsynced_records == 0:
+            return
+        unsynced = _unsynced_records
+        _unsynced_records = 0
+    try:
+        fd = os.open(JOURNAL_FILE, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        with _sync_lock:
+            _unsynced_records += unsynced
+        print(f"Warning: could not sync results journal: {e}")
+
+def read_journal():
+    """Return all records of the journal in the order they were appended"""
+    records = []
+    try:
+        with open(JOURNAL_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # A writer killed mid-record leaves a partial last line
+                    print(f"Skipping unreadable journal line: {line.strip()}")
+    except FileNotFoundError:
+        pass
+    return records
+
+def index_journal():
+    """
+    Add the result records appended to the journal since the last call (e.g.
+    by engine processes) to the index, reading only the part not indexed yet
+    """
+    global _indexed_bytes
+    try:
+        with open(JOURNAL_FILE, "rb") as f:
+            if os.fstat(f.fileno()).st_size < _indexed_bytes:
+                # Reset for a new run by another process
+                _indexed_bytes = 0
+            f.seek(_indexed_bytes)
+            data = f.read()
+    except FileNotFoundError:
+        return
+    # A partial last line is read again next time
+    end = data.rfind(b"\n") + 1
+    for line in data[:end].splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if "key" in record:
+            _latest_results[record["key"]] = record
+    _indexed_bytes += end
+
+def latest_result(key):
+    """The last result record of a key in the journal, or None"""
+    with _index_lock:
+        if key not in _latest_results:
+            index_journal()
+        return _latest_results.get(key)
+
+def reset_journal():
+    """Start an empty journal for a new run"""
+    global _indexed_bytes
+    with open(JOURNAL_FILE, "w", encoding="utf-8") as f:
+        f.write("")
+    with _index_lock:
+        _latest_results.clear()
+        _indexed_bytes = 0
+
+def compact_results(results_file=RESULTS_FILE):
+    """
+    Apply the journal to run-results.json and write it back once, keeping the
+    {"last_run_timestamp", "results"} shape that slack-bot.py reads.
+    Later records for the same key win, and the keys whose result was carried
+    over from an earlier run (incremental mode) are listed under "carried_over".
+    Returns the number of records applied.
+    """
+    try:
+        with open(results_file, "r") as f:
+            results_data = json.load(f)
+    except (OSError, ValueError):
+        results_data = {}
+    results_data.setdefault("last_run_timestamp", "")
+    results_data.setdefault("results", {})
+
+    records = [record for record in read_journal() if "key" in record]
+    carried_over = set()
+    for record in records:
+        results_data["results"][record["key"]] = record["value"]
+        if record.get("details", {}).get("carried_over"):
+            carried_over.add(record["key"])
+        else:
+            carried_over.discard(record["key"])
+    if records:
+        results_data["last_run_timestamp"] = records[-1]["timestamp"]
+        results_data["carried_over"] = sorted(carried_over)
+
+    # Write through a temporary file so readers never see a partial results file
+    tmp_file = f"{results_file}.{os.getpid()}.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(results_data, f, indent=2)
+    os.replace(tmp_file, results_file)
+    return len(records)
+
+def main():
+    if sys.argv[1:] != ["compact"]:
+        print("Usage: results_journal.py compact")
+        sys.exit(1)
+    count = compact_results()
+    print(f"Compacted {count} journal records into {RESULTS_FILE}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+import os
+import sys
+import math
+import sqlite3
+import argparse
+from results_journal import read_journal
+
+# Local store of every nightly run, kept across runs (not pushed)
+HISTORY_DB = os.environ.get("NIGHTLY_HISTORY_DB", "/root/desktop/run-history.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    finished_at TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id TEXT NOT NULL REFERENCES runs(run_id),
+    key TEXT NOT NULL,
+    sdk TEXT NOT NULL,
+    snippet TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    exit_code INTEGER,
+    wall_time REAL,
+    compile_time REAL,
+    timed_out INTEGER,
+    docs_hash TEXT,
+    recorded_at TEXT NOT NULL,
+    fingerprint TEXT,
+    carried_over INTEGER,
+    compile_error INTEGER,
+    PRIMARY KEY (run_id, key)
+);
+CREATE TABLE IF NOT EXISTS builds (
+    run_id TEXT NOT NULL REFERENCES runs(run_id),
+    sdk TEXT NOT NULL,
+    duration REAL NOT NULL,
+    success INTEGER NOT NULL,
+    PRIMARY KEY (run_id, sdk)
+);
+CREATE TABLE IF NOT EXISTS phases (
+    run_id TEXT NOT NULL REFERENCES runs(run_id),
+    key TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    PRIMARY KEY (run_id, key, phase)
+);
+CREATE INDEX IF NOT EXISTS results_by_key ON results (key, run_id);
+CREATE INDEX IF NOT EXISTS results_by_snippet ON results (snippet, sdk, run_id);
+"""
+
+# Columns added to a table after it was first created, so older history databases get them too
+ADDED_COLUMNS = {
+    "results": [("fingerprint", "TEXT"), ("carried_over", "INTEGER"), ("compile_error", "INTEGER")]
+}
+
+def connect(db_path=HISTORY_DB):
+    connection = sqlite3.connect(db_path)
+    connection.row_factory = sqlite3.Row
+    connection.executescript(SCHEMA)
+    for table, columns in ADDED_COLUMNS.items():
+        existing = {row["name"] for row in connection.execute(f"PRAGMA table_info({table})")}
+        for name, column_type in columns:
+            if name not in existing:
+                connection.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+    return connection
+
+def record_run(run_id, started_at, finished_at, records, db_path=HISTORY_DB):
+    """
+    Store a run from its results journal records. Recording the same run
+    again replaces it, so a journal can be re-ingested after a crash.
+    Returns the number of results stored.
+    """
+    builds = {record["build"]: record for record in records if "build" in record}
+    # Later records for the same key win, as in compact_results
+    results = {record["key"]: record for record in records if "key" in record}
+
+    with connect(db_path) as connection:
+        connection.execute("DELETE FROM results WHERE run_id = ?", (run_id,))
+        connection.execute("DELETE FROM builds WHERE run_id = ?", (run_id,))
+        connection.execute("DELETE FROM phases WHERE run_id = ?", (run_id,))
+        connection.execute(
+            "INSERT OR REPLACE INTO runs (run_id, started_at, finished_at) VALUES (?, ?, ?)",
+            (run_id, started_at, finished_at)
+        )
+        for sdk_type, build in builds.items():
+            connection.execute(
+                "INSERT INTO builds (run_id, sdk, duration, success) VALUES (?, ?, ?, ?)",
+                (run_id, sdk_type, build["duration"], int(build["success"]))
+            )
+        for key, record in results.items():
+            details = record.get("details", {})
+            build = builds.get(details.get("sdk"))
+            timed_out = details.get("timed_out")
+            connection.execute(
+                """INSERT INTO results (run_id, key, sdk, snippet, status, exit_code, wall_time,
+                                        compile_time, timed_out, docs_hash, recorded_at,
+                                        fingerprint, carried_over, compile_error)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    run_id, key, details.get("sdk", ""), details.get("snippet", ""),
+                    int(bool(record["value"])), details.get("exit_code"), details.get("wall_time"),
+                    # Lane builds compile all snippets of an SDK at once, so the snippets compiled in it share
+                    # its build time (for JS only the harness's type-check and transpile time, not the snippet runs).
+                    # Carried over, shared and binary cache hits were not compiled and get none.
+                    build["duration"] if build and details.get("lane_compiled") else None,
+                    None if timed_out is None else int(timed_out),
+                    details.get("docs_hash"), record["timestamp"],
+                    # Carried over results were not run, see scripts/incremental.py
+                    details.get("fingerprint"), int(details.get("carried_over", False)),
+                    # The snippet did not compile (lane build or JS harness), so it never ran
+                    int(details.get("compile_error", False))
+                )
+            )
+            # Seconds from process start to each phase marker the snippet printed
+            for phase, seconds in details.get("phases", {}).items():
+                connection.execute(
+                    "INSERT INTO phases (run_id, key, phase, seconds) VALUES (?, ?, ?, ?)",
+                    (run_id, key, phase, seconds)
+                )
+    return len(results)
+
+def key_history(key, nights=30, db_path=HISTORY_DB):
+    """Results of a key over the last `nights` runs that recorded it, oldest first"""
+    with connect(db_path) as connection:
+        rows = connection.execute(
+            """SELECT runs.run_id, runs.started_at, results.*
+               FROM results JOIN runs ON runs.run_id = results.run_id
+               WHERE results.key = ?
+               ORDER BY runs.started_at DESC LIMIT ?""",
+            (key, nights)
+        ).fetchall()
+    return list(reversed(rows))
+
+def last_result(key, db_path=HISTORY_DB):
+    """The latest recorded result row of a key, or None"""
+    with connect(db_path) as connection:
+        return connection.execute(
+            """SELECT runs.run_id, runs.started_at, results.*
+               FROM results JOIN runs ON runs.run_id = results.run_id
+               WHERE results.key = ?
+               ORDER BY runs.started_at DESC LIMIT 1""",
+            (key,)
+        ).fetchone()
+
+def phase_history(key, nights=30, db_path=HISTORY_DB):
+    """
+    Phase latencies of a key over the last `nights` runs that recorded it,
+    oldest first, as (run_id, {phase: seconds}) pairs
+    """
+    history = [(row["run_id"], {}) for row in key_history(key, nights, db_path)]
+    with connect(db_path) as connection:
+        for run_id, phases in history:
+            for row in connection.execute(
+                "SELECT phase, seconds FROM phases WHERE run_id = ? AND key = ?", (run_id, key)
+            ):
+                phases[row["phase"]] = row["seconds"]
+    return history
+
+def duration_percentile(key, percentile=95, nights=30, db_path=HISTORY_DB):
+    """Nearest-rank percentile of the wall time of a key over the last `nights` runs, or None"""
+    durations = sorted(row["wall_time"] for row in key_history(key, nights, db_path) if row["wall_time"] is not None)
+    if not durations:
+        return None
+    rank = max(1, math.ceil(percentile / 100 * len(durations)))
+    return durations[rank - 1]
+
+def first_failure(key, db_path=HISTORY_DB):
+    """
+    First run of the current failing streak of a key, i.e. the first failure
+    after its last success. Returns the row, or None if the latest run passed.
+    """
+    with connect(db_path) as connection:
+        last_success = connection.execute(
+            """SELECT MAX(runs.started_at) FROM results JOIN runs ON runs.run_id = results.run_id
+               WHERE results.key = ? AND results.status = 1""",
+            (key,)
+        ).fetchone()[0]
+        return connection.execute(
+            """SELECT runs.run_id, runs.started_at, results.*
+               FROM results JOIN runs ON runs.run_id = results.run_id
+               WHERE results.key = ? AND results.status = 0 AND runs.started_at > ?
+               ORDER BY runs.started_at ASC LIMIT 1""",
+            (key, last_success or "")
+        ).fetchone()
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the history of nightly runs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    percentile_parser = subparsers.add_parser("percentile", help="Wall time percentile of a result key")
+    percentile_parser.add_argument("key", help="Result key, e.g. avail_rust_da_submit_data")
+    percentile_parser.add_argument("--percentile", type=float, default=95)
+    percentile_parser.add_argument("--nights", type=int, default=30)
+
+    failure_parser = subparsers.add_parser("first-failure", help="First night of the current failing streak of a result key")
+    failure_parser.add_argument("key")
+
+    history_parser = subparsers.add_parser("history", help="Recent results of a result key")
+    history_parser.add_argument("key")
+    history_parser.add_argument("--nights", type=int, default=30)
+
+    phases_parser = subparsers.add_parser("phases", help="Connect / submit / in-block / finalized latencies of a result key")
+    phases_parser.add_argument("key")
+    phases_parser.add_argument("--nights", type=int, default=30)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Store the current results journal as a run")
+    ingest_parser.add_argument("run_id")
+    args = parser.parse_args()
+
+    if args.command == "percentile":
+        value = duration_percentile(args.key, args.percentile, args.nights)
+        if value is None:
+            print(f"No recorded durations for {args.key}")
+            sys.exit(1)
+        print(f"p{args.percentile:g} wall time of {args.key} over the last {args.nights} nights: {value:.3f}s")
+    elif args.command == "first-failure":
+        row = first_failure(args.key)
+        if row is None:
+            print(f"{args.key} is not failing")
+        else:
+            print(f"{args.key} has been failing since run {row['run_id']} (started {row['started_at']})")
+    elif args.command == "history":
+        for row in key_history(args.key, args.nights):
+            status = ("✅" if row["status"] else "❌") + (" (carried over)" if row["carried_over"] else "") + \
+                (" (compile error)" if row["compile_error"] else "")
+            wall_time = "-" if row["wall_time"] is None else f"{row['wall_time']:.3f}s"
+            print(f"{row['run_id']} {status} exit={row['exit_code']} wall={wall_time} "
+                  f"compile={row['compile_time']} timed_out={row['timed_out']} docs={row['docs_hash']} "
+                  f"fingerprint={row['fingerprint']}")
+    elif args.command == "phases":
+        for run_id, phases in phase_history(args.key, args.nights):
+            latencies = " ".join(f"{phase}={seconds:.3f}s" for phase, seconds in sorted(phases.items(), key=lambda item: item[1]))
+            print(f"{run_id} {latencies or '-'}")
+    elif args.command == "ingest":
+        records = read_journal()
+        started_at = records[0]["timestamp"] if records else ""
+        finished_at = records[-1]["timestamp"] if records else ""
+        count = record_run(args.run_id, started_at, finished_at, records)
+        print(f"Stored {count} results for run {args.run_id} in {HISTORY_DB}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import os
+import sys
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Every process of a run appends its spans to this JSONL file (set by main.py)
+TRACE_EVENTS_ENV = "NIGHTLY_TRACE_FILE"
+# Lane the current process belongs to (set by main.py for each child script)
+TRACE_LANE_ENV = "NIGHTLY_TRACE_LANE"
+# Lane of the code running in this context (set by main.py for snippets it runs in-process)
+trace_lane = contextvars.ContextVar("trace_lane", default=None)
+
+def trace_events_file():
+    return os.environ.get(TRACE_EVENTS_ENV)
+
+def record_event(event):
+    """Append one event as a single line, so concurrent lanes never interleave partial events"""
+    events_file = trace_events_file()
+    if not events_file:
+        return
+    line = json.dumps(event) + "\n"
+    try:
+        with open(events_file, "a", encoding="utf-8") as f:
+            f.write(line)
+    except OSError as e:
+        print(f"Warning: could not record trace event: {e}")
+
+@contextmanager
+def span(name, category, lane=None, **args):
+    """
+    Time a phase of the run (fetch, extract, write, compile, run, results, ...).
+    Keyword arguments such as sdk= and snippet= end up as span arguments, and
+    the yielded dict can be used to add more once the outcome is known.
+    Does nothing but yield when main.py did not enable tracing.
+    """
+    span_args = dict(args)
+    start_ns = time.time_ns()
+    try:
+        yield span_args
+    finally:
+        end_ns = time.time_ns()
+        record_event({
+            "name": name,
+            "cat": category,
+            "ts": start_ns // 1000,
+            "dur": (end_ns - start_ns) // 1000,
+            "lane": lane or trace_lane.get() or os.environ.get(TRACE_LANE_ENV, "main"),
+            "process": os.path.basename(sys.argv[0]) or "python",
+            "pid": os.getpid(),
+            "tid": threading.get_native_id(),
+            "args": span_args
+        })
+
+def read_events(events_file):
+    events = []
+    try:
+        with open(events_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    # A process killed mid-write leaves a partial last line
+                    continue
+    except OSError:
+        pass
+    return events
+
+def export_chrome_trace(events_file, output_file, orchestrator_pid=None):
+    """
+    Convert the recorded spans into a Chrome trace-event file (chrome://tracing,
+    Perfetto). Each lane becomes a process row group and each OS process within
+    it (setup script, snippet script, lane build) its own thread row. Spans of
+    the orchestrator (main.py, by default this process) get a row per thread,
+    since the snippets it runs in-process overlap in its worker threads.
+    """
+    if orchestrator_pid is None:
+        orchestrator_pid = os.getpid()
+    events = read_events(events_file)
+    lanes = sorted({event["lane"] for event in events}, key=lambda lane: (lane != "main", lane))
+    lane_pids = {lane: index + 1 for index, lane in enumerate(lanes)}
+
+    trace_events = []
+    for lane, pid in lane_pids.items():
+        trace_events.append({"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": lane}})
+        trace_events.append({"name": "process_sort_index", "ph": "M", "pid": pid, "tid": 0, "args": {"sort_index": pid}})
+
+    named_threads = set()
+    for event in events:
+        pid = lane_pids[event["lane"]]
+        # Threads of the orchestrator share its OS pid, so keep them apart by thread id
+        in_orchestrator = event["pid"] == orchestrator_pid
+        tid = event["tid"] if in_orchestrator else event["pid"]
+        if (pid, tid) not in named_threads:
+            named_threads.add((pid, tid))
+            thread = f"{event['pid']}/{event['tid']}" if in_orchestrator else event["pid"]
+            trace_events.append({
+                "name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                "args": {"name": f"{event['process']} ({thread})"}
+            })
+        trace_events.append({
+            "name": event["name"],
+            "cat": event["cat"],
+            "ph": "X",
+            "ts": event["ts"],
+            "dur": event["dur"],
+            "pid": pid,
+            "tid": tid,
+            "args": event.get("args", {})
+        })
+
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+    return len(events)
@@ -0,0 +1,235 @@
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+import tomllib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from helper_functions import (
+    process_sdk,
+    run_selected_sdks,
+    print_results_summary,
+    add_sdk_arguments,
+    SnippetContext,
+    SDK_TYPES
+)
+from lane_builds import TARGET_DIRS
+from docs_discovery import discover_snippets, load_discovered, manifest_entry, fetch_document, SDK_BLOCKS, FETCH_WORKERS
+from run_trace import span
+
+# Every snippet checked by the nightly run, see the comment at its top for the format
+MANIFEST_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), "snippets.toml")
+
+# Source file of each SDK environment a snippet is written to when it is compiled and run on its own
+TARGET_FILES = {
+    "js": "your-file-name.ts",
+    "rust": os.path.join("src", "main.rs"),
+    "go": "main.go"
+}
+
+# Replaces {run_stamp} in rewrites, e.g. to create a new application key every run
+RUN_STAMP = datetime.now().strftime("%d-%m-%Y-%Y%m%d_%H%M%S")
+
+# Manifests already loaded by this process, by path: (settings, snippets)
+_manifests = {}
+
+def read_manifest(path=MANIFEST_FILE):
+    if path not in _manifests:
+        with open(path, "rb") as f:
+            manifest = tomllib.load(f)
+        settings = {key: value for key, value in manifest.items() if key != "snippets"}
+        _manifests[path] = (settings, parse_snippets(manifest, path))
+    return _manifests[path]
+
+def load_manifest(path=MANIFEST_FILE):
+    """
+    Load and check the snippet manifest once per process. Returns the list of
+    snippets, each with its docs url resolved and a success string for every SDK.
+    """
+    return read_manifest(path)[1]
+
+def manifest_settings(path=MANIFEST_FILE):
+    """Top-level settings of the manifest (docs_base, discover, docs_tree, docs_root)"""
+    return read_manifest(path)[0]
+
+def parse_snippets(manifest, path):
+    snippets = []
+    seen_ids = set()
+    for entry in manifest.get("snippets", []):
+        for field in ("id", "name", "page"):
+            if field not in entry:
+                raise ValueError(f"Snippet {entry.get('id', entry)} in {path} has no {field}")
+        if entry["id"] in seen_ids:
+            raise ValueError(f"Snippet id {entry['id']} is used twice in {path}")
+        seen_ids.add(entry["id"])
+
+        snippet = {
+            "id": entry["id"],
+            "name": entry["name"],
+            "url": f"{manifest['docs_base']}/{entry['page']}/page.mdx"
+        }
+        for sdk_type in SDK_TYPES:
+            if sdk_type not in entry:
+                continue
+            sdk_entry = entry[sdk_type]
+            success = sdk_entry.get("success", entry.get("success"))
+            if "content" not in sdk_entry or "run" not in sdk_entry or not success:
+                raise ValueError(f"{sdk_type} of snippet {entry['id']} in {path} needs content, run and success")
+            snippet[sdk_type] = {**sdk_entry, "success": success}
+            stall_timeout = sdk_entry.get("stall_timeout", entry.get("stall_timeout"))
+            if stall_timeout is not None:
+                snippet[sdk_type]["stall_timeout"] = stall_timeout
+        snippets.append(snippet)
+    return snippets
+
+def discover(path=MANIFEST_FILE):
+    """Snippets on the docs pages below the manifest's discover directories that it does not list"""
+    return discover_snippets(manifest_settings(path), load_manifest(path))
+
+def find_snippet(snippet_id, snippets):
+    for snippet in snippets:
+        if snippet["id"] == snippet_id:
+            return snippet
+    raise KeyError(f"No snippet {snippet_id} in the manifest or the discovered snippets")
+
+def rewrite_content(rewrites):
+    """Return a content rewrite applying the manifest rewrites of a snippet, or None"""
+    if not rewrites:
+        return None
+    def transform(code):
+        for rewrite in rewrites:
+            replacement = rewrite["replace"].replace("{run_stamp}", RUN_STAMP)
+            code = re.sub(rewrite["pattern"], replacement, code)
+            print(f"Applied rewrite {rewrite['pattern']} -> {replacement}")
+        return code
+    return transform
+
+def normalize_code(code):
+    """Code without the trailing whitespace and blank edges that do not change what it does"""
+    return "\n".join(line.rstrip() for line in code.strip().splitlines())
+
+def shared_runs(snippets, sdk_types=SDK_TYPES):
+    """
+    Find the snippets that would run exactly what an earlier snippet of the
+    list runs, e.g. the docs-section twin of an API reference page: the same
+    normalised code, rewrites, run command and success string for an SDK.
+    Returns {(sdk, snippet id): id of the earlier snippet}. Only the earlier
+    one is run, the others report its result.
+    """
+    urls = sorted({snippet["url"] for snippet in snippets})
+    with span("plan shared runs", "fetch", pages=len(urls)):
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+            documents = dict(zip(urls, executor.map(fetch_document, urls)))
+
+    first_snippet = {}
+    shared = {}
+    for snippet in snippets:
+        document = documents[snippet["url"]]
+        for sdk_type in sdk_types:
+            sdk_entry = snippet.get(sdk_type)
+            if sdk_entry is None or document is None:
+                continue
+            filename, language = SDK_BLOCKS[sdk_type]
+            code = document.content(sdk_entry["content"], language, filename)
+            run_cmd = document.command(sdk_entry["run"])
+            if not code or not run_cmd:
+                continue
+            run_key = hashlib.sha256(json.dumps([
+                sdk_type, normalize_code(code), sdk_entry.get("rewrites", []), " ".join(run_cmd.split()), sdk_entry["success"]
+            ]).encode("utf-8")).hexdigest()
+            if run_key in first_snippet:
+                shared[(sdk_type, snippet["id"])] = first_snippet[run_key]
+            else:
+                first_snippet[run_key] = snippet["id"]
+    return shared
+
+def process_snippet_sdk(snippet, sdk_type, context):
+    """Check one snippet in one SDK, None if the manifest lists no code for that SDK"""
+    sdk_entry = snippet.get(sdk_type)
+    if sdk_entry is None:
+        print(f"{snippet['name']} has no {sdk_type} snippet")
+        return None
+    target_dir = TARGET_DIRS[sdk_type]
+    return process_sdk(
+        sdk_type=sdk_type,
+        snippet_name=snippet["name"],
+        content_cmd=sdk_entry["content"],
+        run_cmd_id=sdk_entry["run"],
+        success_string=sdk_entry["success"],
+        target_file=os.path.join(target_dir, TARGET_FILES[sdk_type]),
+        target_dir=target_dir,
+        snippet_id=snippet["id"],
+        url=snippet["url"],
+        transform_content=rewrite_content(sdk_entry.get("rewrites")),
+        shared_with=context.shared_runs.get((sdk_type, snippet["id"])),
+        stall_timeout=sdk_entry.get("stall_timeout")
+    )
+
+def run_snippet(snippet, context):
+    """Check a snippet in the SDKs and lane build stage of the context, returns True if all of them passed"""
+    print(f"=== Running {snippet['name']} Test for All SDKs ===")
+
+    # Process each SDK
+    processors = [partial(process_snippet_sdk, snippet, sdk_type, context) for sdk_type in SDK_TYPES]
+    js_result, rust_result, go_result = run_selected_sdks(context, *processors)
+
+    # Print results summary
+    return print_results_summary(snippet["name"], js_result, rust_result, go_result)
+
+def main():
+    parser = argparse.ArgumentParser(description="Check docs snippets from the snippet manifest")
+    parser.add_argument(
+        "--snippet",
+        action="append",
+        help="Only check the snippet with this id (can be repeated). Defaults to all snippets."
+    )
+    parser.add_argument("--list", action="store_true", help="List the snippets and exit")
+    parser.add_argument(
+        "--discover",
+        action="store_true",
+        help="Also check the snippets found on the docs pages that the manifest does not list and run_discovered allows"
+    )
+    parser.add_argument(
+        "--discovered",
+        metavar="FILE",
+        help="Also check the discovered snippets main.py wrote to this file, instead of scanning the docs pages again"
+    )
+    parser.add_argument(
+        "--toml",
+        action="store_true",
+        help="With --list --discover, print manifest entries for the discovered snippets"
+    )
+    add_sdk_arguments(parser)
+    args = parser.parse_args()
+
+    snippets = load_manifest() + (discover() if args.discover else [])
+    if args.discovered:
+        snippets += load_discovered(args.discovered)
+
+    if args.list:
+        for snippet in snippets:
+            if args.toml and snippet.get("discovered"):
+                print(f"\n{manifest_entry(snippet)}")
+            elif not args.toml:
+                sdks = ", ".join(sdk_type for sdk_type in SDK_TYPES if sdk_type in snippet)
+                reported_only = " [reported only]" if not snippet.get("runnable", True) else ""
+                print(f"{snippet['id']}: {snippet['name']} ({sdks}){reported_only}")
+        return
+    # Discovered snippets not listed in run_discovered are never executed
+    snippets = [snippet for snippet in snippets if snippet.get("runnable", True)]
+
+    # Planned over all snippets, so a snippet checked on its own still reuses the result of its earlier twin
+    shared = shared_runs(snippets, args.sdk or SDK_TYPES)
+    if args.snippet:
+        snippets = [find_snippet(snippet_id, snippets) for snippet_id in args.snippet]
+    context = SnippetContext(args.sdk, args.stage, shared)
+    results = [run_snippet(snippet, context) for snippet in snippets]
+
+    # Exit code based on success (0) or failure (1)
+    sys.exit(0 if all(results) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import os
+import sys
+import glob
+import json
+import stat
+import shutil
+import argparse
+from datetime import datetime
+
+# Package stores and build caches of the SDK toolchains, kept across runs (not pushed)
+CACHE_ROOT = os.environ.get("NIGHTLY_TOOLCHAIN_CACHE_DIR", "/root/desktop/.cache/toolchains")
+# Least recently used cache entries are evicted at the end of a run until all caches fit in this size
+CACHE_BUDGET_BYTES = int(os.environ.get("NIGHTLY_TOOLCHAIN_CACHE_BYTES", str(20 * 1024 ** 3)))
+# One line of hit/miss statistics per run
+STATS_FILE = os.path.join(CACHE_ROOT, "stats.jsonl")
+
+def glob_entries(*patterns):
+    return lambda cache_dir: [path for pattern in patterns for path in glob.glob(os.path.join(cache_dir, pattern))]
+
+def whole_cache(cache_dir):
+    return [cache_dir] if os.path.isdir(cache_dir) else []
+
+def module_entries(cache_dir):
+    """Extracted module versions (module@version) and download directories (@v) of the Go module cache"""
+    entries = []
+    for root, dirs, _ in os.walk(cache_dir):
+        for name in list(dirs):
+            if "@" in name:
+                entries.append(os.path.join(root, name))
+                dirs.remove(name)
+    return entries
+
+# Every managed cache: the environment variable pinning it to its directory under
+# CACHE_ROOT, and its entries that can be evicted on their own (the toolchain
+# downloads or rebuilds a missing one). The pnpm store shares its files between
+# packages, so it is only evicted as a whole.
+TOOLCHAIN_CACHES = {
+    "pnpm-store": {"env": "npm_config_store_dir", "entries": whole_cache},
+    "go-mod": {"env": "GOMODCACHE", "entries": module_entries},
+    "go-build": {"env": "GOCACHE", "entries": glob_entries("??/*")},
+    "cargo": {
+        "env": "CARGO_HOME",
+        "entries": glob_entries("registry/cache/*/*", "registry/src/*/*", "git/checkouts/*", "git/db/*")
+    }
+}
+
+def cache_dir(name):
+    return os.path.join(CACHE_ROOT, name)
+
+def cache_env():
+    """Create the cache directories and return the environment variables pointing the toolchains at them"""
+    env = {}
+    for name, cache in TOOLCHAIN_CACHES.items():
+        os.makedirs(cache_dir(name), exist_ok=True)
+        env[cache["env"]] = cache_dir(name)
+    return env
+
+def entry_paths(path):
+    yield path
+    if os.path.isdir(path) and not os.path.islink(path):
+        for root, dirs, files in os.walk(path):
+            for name in dirs + files:
+                yield os.path.join(root, name)
+
+def entry_usage(path):
+    """(size in bytes, last time a file of it was read or written) of a cache entry"""
+    size = 0
+    last_used = 0
+    for item in entry_paths(path):
+        try:
+            item_stat = os.lstat(item)
+        except OSError:
+            continue
+        if stat.S_ISDIR(item_stat.st_mode):
+            # Listing a directory (as this walk does) updates its access time
+            last_used = max(last_used, item_stat.st_mtime)
+        else:
+            size += item_stat.st_size
+            last_used = max(last_used, item_stat.st_atime, item_stat.st_mtime)
+    return size, last_used
+
+def inventory():
+    """{cache name: {entry path: (size, last used)}} of every managed cache"""
+    return {
+        name: {path: entry_usage(path) for path in cache["entries"](cache_dir(name))}
+        for name, cache in TOOLCHAIN_CACHES.items()
+    }
+
+def cache_stats(before, after, since):
+    """
+    Hits are entries that were in a cache before the run and were used during
+    it (by access time), misses are entries the run had to add.
+    """
+    stats = {}
+    for name, entries in after.items():
+        previous = before.get(name, {})
+        hits = [path for path in entries if path in previous and entries[path][1] >= since]
+        misses = [path for path in entries if path not in previous]
+        stats[name] = {
+            "hits": len(hits),
+            "misses": len(misses),
+            "entries": len(entries),
+            "bytes": sum(size for size, _ in entries.values()),
+            "added_bytes": sum(entries[path][0] for path in misses)
+        }
+    return stats
+
+def record_stats(run_id, before, since):
+    """Print and store the hit/miss statistics of a run, returns the inventory after it"""
+    after = inventory()
+    stats = cache_stats(before, after, since)
+    for name, cache in stats.items():
+        print(f"{name}: {cache['hits']} hits, {cache['misses']} misses (+{cache['added_bytes'] / 1024 ** 2:.1f} MiB), "
+              f"{cache['entries']} entries, {cache['bytes'] / 1024 ** 2:.1f} MiB")
+    try:
+        with open(STATS_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"run_id": run_id, "recorded_at": datetime.now().isoformat(), "caches": stats}) + "\n")
+    except OSError as e:
+        print(f"Warning: could not record toolchain cache statistics: {e}")
+    return after
+
+def remove_entry(path):
+    if os.path.isdir(path) and not os.path.islink(path):
+        # The Go module cache makes its directories read-only
+        for root, _, _ in os.walk(path):
+            os.chmod(root, 0o755)
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+
+def evict_caches(budget=CACHE_BUDGET_BYTES, current=None):
+    """Remove the least recently used entries of all caches until they fit in budget. Returns the bytes freed."""
+    current = current or inventory()
+    entries = sorted(
+        (last_used, size, name, path)
+        for name, cache_entries in current.items()
+        for path, (size, last_used) in cache_entries.items()
+    )
+    total = sum(size for _, size, _, _ in entries)
+    freed = 0
+    for _, size, name, path in entries:
+        if total <= budget:
+            break
+        try:
+            remove_entry(path)
+        except OSError as e:
+            print(f"Warning: could not evict {path}: {e}")
+            continue
+        total -= size
+        freed += size
+        print(f"Evicted {os.path.relpath(path, CACHE_ROOT)} ({size / 1024 ** 2:.1f} MiB) from {name}")
+    print(f"Toolchain caches use {total / 1024 ** 3:.2f} GiB of the {budget / 1024 ** 3:.2f} GiB budget")
+    return freed
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and trim the toolchain caches shared by the nightly runs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    stats_parser = subparsers.add_parser("stats", help="Hit/miss statistics of recent runs")
+    stats_parser.add_argument("--runs", type=int, default=7)
+    evict_parser = subparsers.add_parser("evict", help="Evict least recently used entries down to the budget")
+    evict_parser.add_argument("--budget", type=int, default=CACHE_BUDGET_BYTES, help="Disk budget in bytes")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        try:
+            with open(STATS_FILE, "r", encoding="utf-8") as f:
+                runs = [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            print(f"No statistics recorded in {STATS_FILE}")
+            sys.exit(1)
+        for run in runs[-args.runs:]:
+            summary = ", ".join(f"{name} {cache['hits']}/{cache['misses']}" for name, cache in run["caches"].items())
+            print(f"{run['run_id']} hits/misses: {summary}")
+    elif args.command == "evict":
+        freed = evict_caches(args.budget)
+        print(f"Freed {freed / 1024 ** 2:.1f} MiB")
+
+if __name__ == "__main__":
+    main()
@@ -36,6 +36,8 @@ if not data:
 # Extract timestamp and results
 timestamp = data.get("last_run_timestamp", "Unknown time")
 results = data.get("results", {})
+# Unchanged snippets that an incremental run did not rerun
+carried_over = set(data.get("carried_over", []))
 
 # Format the timestamp for display
 try:
@@ -55,6 +57,8 @@ message += f"*Avail SDK Tests - Run at {formatted_time}*\n```\n"
 # Use enumerate to get both index and item
 for i, (label, value) in enumerate(results.items(), 1):  # Start counting from 1
     status = "✅" if value else "❌"
+    if label in carried_over:
+        status += " (unchanged, carried over)"
     # Format the label more nicely by replacing underscores with spaces and capitalizing
     display_label = label.replace("_", " ").title()
     message += f"{i}. {display_label}: {status}\n"  # Add the number with a period